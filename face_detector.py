@@ -113,7 +113,7 @@ def main():
     # Extract settings from config
     input_image = config["input_image"]
     output_image = config["output_image"]
-    use_histogram_equalization = config["use_histogram_equalization"]
+    use_histogram_equalization = config.get("use_histogram_equalization", True)
     use_gamma_correction = config["use_gamma_correction"]
     gamma_value = config["gamma_value"]
     face_detection_model = config["face_detection_model"]
@@ -7,12 +7,18 @@ from src.controllers.student import student_router
 from src.controllers.classroom import classroom_router
 from src.controllers.attendance import attendance_router
 from src.database.connection import db
+from src.database.listener import listener
+from src.database.invalidation import CHANNEL, invalidation_bus, make_event
+from src.utils.responses import FastJSONResponse
+from src.utils.compression import CompressionMiddleware
+from src.utils.events import attendance_events
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(
     title="Student Attendance System",
     description="Automatic facial recognition attendance system",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -24,6 +30,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses with brotli or gzip depending on the client
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 # Register routers
 app.include_router(auth_router)
 app.include_router(admin_router)
@@ -33,15 +42,32 @@ app.include_router(classroom_router)
 app.include_router(attendance_router)
 
 
+def on_attendance_change(event: dict):
+    """Relay one statement's attendance changes of a session to live views and response caches"""
+    attendance_events.publish(event["session_id"], event)
+    # The face pipeline writes outside DatabaseOperations, so evict here too;
+    # large batches arrive without rows and evict the whole table
+    invalidation_bus.dispatch(
+        make_event("attendances", event.get("rows"), "attendance_id")
+    )
+
+
 @app.on_event("startup")
 async def startup():
     """Initialize database connection on startup"""
     db.connect()
 
+    # Attendance changes from any worker or the face pipeline arrive via NOTIFY
+    listener.register("attendance_changes", on_attendance_change)
+    # Evict caches when other workers write through DatabaseOperations
+    listener.register(CHANNEL, invalidation_bus.dispatch_remote)
+    listener.start()
+
 
 @app.on_event("shutdown")
 async def shutdown():
     """Close database connection on shutdown"""
+    listener.stop()
     db.disconnect()
 
 
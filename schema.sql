@@ -82,4 +82,154 @@ CREATE TABLE
     created_at TIMESTAMP NOT NULL DEFAULT now (),
     updated_at TIMESTAMP NOT NULL DEFAULT now (),
     UNIQUE (session_id, student_id)
-  );
\ No newline at end of file
+  );
+-- Indexes
+CREATE INDEX IF NOT EXISTS classrooms_instructor_id_idx ON classrooms (instructor_id);
+
+-- Trigram index for student name search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS students_name_trgm_idx ON students USING gin (name gin_trgm_ops);
+
+-- Covering index for attendance version stamps (max(updated_at), count(*))
+CREATE INDEX IF NOT EXISTS attendances_session_updated_idx ON attendances (session_id, updated_at);
+
+-- Keep updated_at current on every UPDATE; ETags are derived from it
+CREATE OR REPLACE FUNCTION set_updated_at () RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = now();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER admins_set_updated_at BEFORE UPDATE ON admins FOR EACH ROW EXECUTE FUNCTION set_updated_at ();
+CREATE TRIGGER instructors_set_updated_at BEFORE UPDATE ON instructors FOR EACH ROW EXECUTE FUNCTION set_updated_at ();
+CREATE TRIGGER students_set_updated_at BEFORE UPDATE ON students FOR EACH ROW EXECUTE FUNCTION set_updated_at ();
+CREATE TRIGGER classrooms_set_updated_at BEFORE UPDATE ON classrooms FOR EACH ROW EXECUTE FUNCTION set_updated_at ();
+CREATE TRIGGER classroom_enrollments_set_updated_at BEFORE UPDATE ON classroom_enrollments FOR EACH ROW EXECUTE FUNCTION set_updated_at ();
+CREATE TRIGGER class_sessions_set_updated_at BEFORE UPDATE ON class_sessions FOR EACH ROW EXECUTE FUNCTION set_updated_at ();
+CREATE TRIGGER attendances_set_updated_at BEFORE UPDATE ON attendances FOR EACH ROW EXECUTE FUNCTION set_updated_at ();
+
+-- Delta sync: tombstones for deleted rows, indexes for updated_at scans
+CREATE TABLE
+  deleted_records (
+    table_name VARCHAR(63) NOT NULL,
+    record_id INT NOT NULL,
+    scope_id INT, -- instructor_id for classrooms, classroom_id for attendances
+    deleted_at TIMESTAMP NOT NULL DEFAULT now ()
+  );
+
+CREATE INDEX IF NOT EXISTS deleted_records_table_deleted_at_idx ON deleted_records (table_name, deleted_at);
+CREATE INDEX IF NOT EXISTS students_updated_at_idx ON students (updated_at);
+CREATE INDEX IF NOT EXISTS classrooms_updated_at_idx ON classrooms (updated_at);
+
+-- TG_ARGV[0]: primary key column, TG_ARGV[1]: optional scope column
+CREATE OR REPLACE FUNCTION record_deletion () RETURNS TRIGGER AS $$
+DECLARE
+  old_row JSONB := to_jsonb(OLD);
+BEGIN
+  INSERT INTO deleted_records (table_name, record_id, scope_id)
+  VALUES (
+    TG_TABLE_NAME,
+    (old_row ->> TG_ARGV[0])::INT,
+    CASE WHEN TG_NARGS > 1 THEN (old_row ->> TG_ARGV[1])::INT END
+  );
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_attendance_deletion () RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO deleted_records (table_name, record_id, scope_id)
+  SELECT TG_TABLE_NAME, OLD.attendance_id, classroom_id
+  FROM class_sessions
+  WHERE session_id = OLD.session_id;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER students_record_deletion AFTER DELETE ON students FOR EACH ROW EXECUTE FUNCTION record_deletion ('student_id');
+CREATE TRIGGER classrooms_record_deletion AFTER DELETE ON classrooms FOR EACH ROW EXECUTE FUNCTION record_deletion ('classroom_id', 'instructor_id');
+CREATE TRIGGER attendances_record_deletion AFTER DELETE ON attendances FOR EACH ROW EXECUTE FUNCTION record_attendance_deletion ();
+
+-- Live attendance: announce each statement's changes on the attendance_changes
+-- channel, one NOTIFY per session so a bulk update of a whole class is one
+-- message. NOTIFY is delivered on commit, so listeners never see rolled-back
+-- rows. Payloads are capped at 8000 bytes, so large batches carry only the
+-- count and a `since` hint for GET /attendance/changes instead of the rows.
+CREATE OR REPLACE FUNCTION notify_attendance_change () RETURNS TRIGGER AS $$
+DECLARE
+  s RECORD;
+BEGIN
+  FOR s IN
+    SELECT
+      c.session_id,
+      cs.classroom_id,
+      count(*) AS row_count,
+      CASE
+        WHEN TG_OP = 'DELETE' THEN LOCALTIMESTAMP
+        ELSE least (min(c.updated_at), LOCALTIMESTAMP)
+      END - INTERVAL '1 microsecond' AS since,
+      json_agg(
+        json_build_object(
+          'attendance_id', c.attendance_id,
+          'student_id', c.student_id,
+          'status', c.status,
+          'marked_by', c.marked_by,
+          'updated_at', c.updated_at
+        )
+        ORDER BY c.attendance_id
+      ) AS rows
+    FROM changed c
+    LEFT JOIN class_sessions cs ON cs.session_id = c.session_id
+    GROUP BY c.session_id, cs.classroom_id
+  LOOP
+    PERFORM pg_notify(
+      'attendance_changes',
+      json_build_object(
+        'op', lower(TG_OP),
+        'session_id', s.session_id,
+        'classroom_id', s.classroom_id,
+        'count', s.row_count,
+        'since', s.since,
+        'rows', CASE WHEN s.row_count <= 40 THEN s.rows END
+      )::TEXT
+    );
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+CREATE TRIGGER attendances_notify_insert AFTER INSERT ON attendances REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION notify_attendance_change ();
+
+CREATE TRIGGER attendances_notify_update AFTER UPDATE ON attendances REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION notify_attendance_change ();
+
+CREATE TRIGGER attendances_notify_delete AFTER DELETE ON attendances REFERENCING OLD TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION notify_attendance_change ();
+
+-- Idempotency-Key replay store for retried POSTs; status_code is NULL while
+-- the first request is still in flight
+CREATE TABLE
+  idempotency_keys (
+    scope VARCHAR(64) NOT NULL, -- role:user_id of the caller
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code INT,
+    response_body BYTEA,
+    created_at TIMESTAMP NOT NULL DEFAULT now (),
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, idempotency_key)
+  );
+
+CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at_idx ON idempotency_keys (expires_at);
+
+-- Encrypted, packed roster embeddings per classroom for the face pipeline.
+-- roster_version is the enrollment/template stamp the bundle was built from;
+-- a bundle whose stamp no longer matches is rebuilt on next load.
+CREATE TABLE
+  classroom_embedding_bundles (
+    classroom_id INT PRIMARY KEY REFERENCES classrooms (classroom_id) ON DELETE CASCADE,
+    roster_version VARCHAR(100) NOT NULL,
+    student_count INT NOT NULL,
+    bundle BYTEA NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now ()
+  );
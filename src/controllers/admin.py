@@ -4,6 +4,7 @@ from typing import List, Dict
 from ..models.admin import Admin
 from ..schemas import AdminCreate, AdminResponse
 from ..utils.auth import hash_password, admin_required
+from ..utils.responses import fast_response, sparse_fields, sparse_model
 
 admin_router = APIRouter(prefix="/admins", tags=["Admins"])
 
@@ -33,11 +34,14 @@ async def create_admin(
     return created_admin[0]
 
 
-@admin_router.get("/", response_model=List[AdminResponse])
-async def get_admins(current_user: Dict = Depends(admin_required)):
+@admin_router.get("/", response_model=List[sparse_model(AdminResponse)])
+async def get_admins(
+    current_user: Dict = Depends(admin_required),
+    fields: List[str] = Depends(sparse_fields(AdminResponse)),
+):
     """Get all admins (admin only)"""
-    admins = Admin.getAll()
-    return admins
+    admins = Admin.getAll(columns=fields)
+    return fast_response(admins, AdminResponse, fields=fields)
 
 
 @admin_router.get("/{admin_id}", response_model=AdminResponse)
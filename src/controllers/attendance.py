@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List, Dict, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional, Iterable
+from datetime import date, datetime
+import asyncio
+import csv
+import io
+import json
+import zlib
 
 from ..models.student import Student
-from ..models.classroom_enrollment import ClassroomEnrollment
 from ..models.class_session import ClassSession
 from ..models.classroom import Classroom
 from ..models.attendance import Attendance
@@ -10,625 +17,563 @@ from ..schemas import (
     AttendanceCreate,
     AttendanceResponse,
     AttendanceUpdate,
+    BulkAttendanceUpdate,
     ProcessAttendanceRequest,
     ProcessAttendanceResponse,
     AttendanceStats,
     StudentAttendanceRecord,
+    AttendanceMatrix,
+    AttendanceChanges,
+    AttendanceStatusEnum,
+    MarkedByEnum,
 )
 
 from ..utils.auth import admin_or_instructor_required, get_current_user
-# from ..utils.face import face_recognition
+from ..utils.responses import FastJSONResponse, changes_response, fast_response
+from ..utils.etag import etag_headers, is_not_modified, make_etag, not_modified
+from ..utils.events import Resync, attendance_events
+from ..utils.cache import cached
+from ..utils.idempotency import idempotent
 
 attendance_router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
+EXPORT_COLUMNS = [
+    "session_date",
+    "start_time",
+    "end_time",
+    "student_number",
+    "student_name",
+    "status",
+    "marked_by",
+    "updated_at",
+]
+
+# Comment sent on idle event streams so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _get_owned_session(session_id: int, current_user: Dict, action: str) -> Dict:
+    """Fetch a session and check that an instructor owns its classroom"""
+    try:
+        session = ClassSession.getWithInstructor(session_id)
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session with ID {session_id} not found",
+        )
+
+    if (
+        current_user["role"] == "instructor"
+        and session["instructor_id"] != current_user["user_id"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only {action} for your own classrooms",
+        )
+
+    return session
+
+
+def _get_owned_classroom(classroom_id: int, current_user: Dict, action: str) -> Dict:
+    """Fetch a classroom and check that an instructor owns it"""
+    try:
+        classroom = Classroom.getById(classroom_id)
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Classroom with ID {classroom_id} not found",
+        )
+
+    if (
+        current_user["role"] == "instructor"
+        and classroom["instructor_id"] != current_user["user_id"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only {action} for your own classrooms",
+        )
+
+    return classroom
+
+
+def _get_owned_attendance(
+    attendance_id: int, current_user: Dict, action: str
+) -> Dict:
+    """Fetch an attendance record and check that an instructor owns its classroom"""
+    try:
+        attendance = Attendance.getWithInstructor(attendance_id)
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Attendance record with ID {attendance_id} not found",
+        )
+
+    if (
+        current_user["role"] == "instructor"
+        and attendance["instructor_id"] != current_user["user_id"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only {action} for your own classrooms",
+        )
+
+    return attendance
+
+
+def _csv_stream(batches: Iterable[List[tuple]], compress: bool = False):
+    """Encode row batches as CSV chunks, optionally as one gzip stream"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def flush():
+        chunk = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor:
+            # Sync flush so the client receives each batch as soon as it is ready
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return chunk
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield flush()
+
+    for rows in batches:
+        writer.writerows(rows)
+        yield flush()
+
+    if compressor:
+        yield compressor.flush()
+
+
+@attendance_router.post(
+    "/", response_model=AttendanceResponse, status_code=status.HTTP_201_CREATED
+)
+async def create_attendance(
+    attendance: AttendanceCreate,
+    current_user: Dict = Depends(admin_or_instructor_required),
+):
+    """Manually create/update attendance record"""
+    session = _get_owned_session(
+        attendance.session_id, current_user, "manage attendance"
+    )
+
+    # Upsert in one statement; students outside the classroom are skipped
+    upserted = Attendance.upsertMany(
+        attendance.session_id,
+        session["classroom_id"],
+        [(attendance.student_id, attendance.status.value)],
+        attendance.marked_by.value,
+    )
+
+    if not upserted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Student is not enrolled in this classroom",
+        )
+
+    return upserted[0]
+
+
+@attendance_router.post("/process", response_model=ProcessAttendanceResponse)
+@idempotent()
+async def process_attendance_with_face_recognition(
+    request: ProcessAttendanceRequest,
+    current_user: Dict = Depends(admin_or_instructor_required),
+):
+    """Process attendance using face recognition"""
+    # Imported lazily: utils.face needs the opencv-contrib `cv2.face` module
+    from ..utils.face import face_recognition
+
+    session = _get_owned_session(request.session_id, current_user, "manage attendance")
+
+    # Get face templates of all enrolled students in one query
+    student_templates = Student.getFaceTemplatesByClassroom(session["classroom_id"])
+
+    # Recognition is CPU-bound; run it off the event loop so other requests
+    # and live attendance streams keep being served
+    recognized_students = await run_in_threadpool(
+        face_recognition.process_attendance_image,
+        request.image_data,
+        student_templates,
+    )
+
+    # Mark all recognized students present in one statement
+    attendances = []
+    if recognized_students:
+        attendances = Attendance.upsertMany(
+            request.session_id,
+            session["classroom_id"],
+            [(s["student_id"], "present") for s in recognized_students],
+            MarkedByEnum.SYSTEM.value,
+        )
+
+    return {
+        "session_id": request.session_id,
+        "processed_students": recognized_students,
+        "attendances": attendances,
+    }
+
+
+def _sse_message(event: str, data: Dict, event_id: Optional[str] = None) -> str:
+    """Format one SSE message"""
+    id_line = f"id: {event_id}\n" if event_id else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _sse_stream(
+    request: Request,
+    queue: asyncio.Queue,
+    session_ids: List[int],
+    last_event_id: Optional[str] = None,
+):
+    """Yield queued attendance changes as SSE messages until the client leaves
+
+    Message ids are the `since` of each change; a reconnecting client, or one
+    that fell behind and had events dropped, gets a resync message naming the
+    timestamp to refetch GET /attendance/changes from.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        if last_event_id:
+            yield _sse_message("resync", {"since": last_event_id}, last_event_id)
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if isinstance(event, Resync):
+                # Resume from the oldest change the client missed
+                since = event.oldest["since"]
+                yield _sse_message("resync", {"since": since}, since)
+            else:
+                yield _sse_message("attendance", event, event["since"])
+    finally:
+        attendance_events.unsubscribe(session_ids, queue)
+
+
+@attendance_router.get("/events")
+async def stream_attendance_events(
+    request: Request,
+    session_id: List[int] = Query(..., description="Sessions to watch"),
+    current_user: Dict = Depends(get_current_user),
+):
+    """Stream attendance changes of the watched sessions as Server-Sent Events
+
+    Each `attendance` message covers one write statement in one session; its
+    `rows` are null when the batch was too large to send, in which case the
+    client refetches GET /attendance/changes from the message's `since`.
+    """
+    session_ids = list(dict.fromkeys(session_id))
+    for watched_id in session_ids:
+        _get_owned_session(watched_id, current_user, "access attendance")
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        try:
+            datetime.fromisoformat(last_event_id)
+        except ValueError:
+            last_event_id = None
+
+    # Subscribe before responding so no change slips in between
+    queue = attendance_events.subscribe(session_ids)
+
+    return StreamingResponse(
+        _sse_stream(request, queue, session_ids, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@attendance_router.get(
+    "/sessions/{session_id}", response_model=List[AttendanceResponse]
+)
+@cached(
+    tags=[("class_sessions", "session_id"), ("classrooms", None), ("attendances", None)]
+)
+async def get_session_attendance(
+    session_id: int, request: Request, current_user: Dict = Depends(get_current_user)
+):
+    """Get all attendance records for a session"""
+    session = _get_owned_session(session_id, current_user, "access attendance")
+
+    etag = make_etag(
+        request,
+        current_user,
+        ClassSession.getAttendanceVersion(session_id, session["classroom_id"]),
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return fast_response(
+        Attendance.getBySession(session_id),
+        AttendanceResponse,
+        headers=etag_headers(etag),
+    )
+
+
+@attendance_router.put(
+    "/sessions/{session_id}", response_model=List[AttendanceResponse]
+)
+async def update_session_attendance(
+    session_id: int,
+    attendance: BulkAttendanceUpdate,
+    current_user: Dict = Depends(admin_or_instructor_required),
+):
+    """Set the status of many students in a session at once"""
+    session = _get_owned_session(session_id, current_user, "update attendance")
+
+    if not attendance.records:
+        return []
+
+    # One upsert in one transaction; students outside the classroom are skipped
+    return Attendance.upsertMany(
+        session_id,
+        session["classroom_id"],
+        [(r.student_id, r.status.value) for r in attendance.records],
+        MarkedByEnum.INSTRUCTOR.value,
+    )
+
+
+@attendance_router.get("/changes", response_model=AttendanceChanges)
+async def get_attendance_changes(
+    classroom_id: int,
+    current_user: Dict = Depends(get_current_user),
+    since: Optional[datetime] = None,
+):
+    """Get a classroom's attendance changed or deleted since a timestamp"""
+    _get_owned_classroom(classroom_id, current_user, "access attendance")
+
+    until = Attendance.getSyncWatermark()
+    changed = Attendance.getChangedSince(classroom_id, since)
+    deleted = Attendance.getDeletedSince(since, classroom_id) if since else []
+
+    return changes_response(since, until, changed, deleted, AttendanceResponse)
+
+
+@attendance_router.put("/{attendance_id}", response_model=AttendanceResponse)
+async def update_attendance(
+    attendance_id: int,
+    attendance: AttendanceUpdate,
+    current_user: Dict = Depends(admin_or_instructor_required),
+):
+    """Update an attendance record"""
+    _get_owned_attendance(attendance_id, current_user, "update attendance")
+
+    # Update attendance record
+    updated_attendance = Attendance.update(
+        attendance_id,
+        status=attendance.status,
+        marked_by=attendance.marked_by,
+    )
+
+    return updated_attendance[0]
+
+
+@attendance_router.delete("/{attendance_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_attendance(
+    attendance_id: int, current_user: Dict = Depends(admin_or_instructor_required)
+):
+    """Delete an attendance record"""
+    _get_owned_attendance(attendance_id, current_user, "delete attendance")
+
+    Attendance.delete(attendance_id)
+    return None
+
+
+@attendance_router.get(
+    "/classroom/{classroom_id}/stats", response_model=AttendanceStats
+)
+@cached(
+    tags=[
+        ("classrooms", "classroom_id"),
+        ("classroom_enrollments", None),
+        ("students", None),
+        ("class_sessions", None),
+        ("attendances", None),
+    ]
+)
+async def get_classroom_attendance_stats(
+    classroom_id: int, request: Request, current_user: Dict = Depends(get_current_user)
+):
+    """Get attendance statistics for a classroom"""
+    _get_owned_classroom(classroom_id, current_user, "access stats")
+
+    etag = make_etag(request, current_user, Classroom.getVersion(classroom_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return FastJSONResponse(
+        Attendance.getClassroomStats(classroom_id), headers=etag_headers(etag)
+    )
+
+
+@attendance_router.get(
+    "/student/{student_id}/classroom/{classroom_id}",
+    response_model=StudentAttendanceRecord,
+)
+@cached(
+    tags=[
+        ("classrooms", "classroom_id"),
+        ("classroom_enrollments", None),
+        ("students", None),
+        ("class_sessions", None),
+        ("attendances", None),
+    ]
+)
+async def get_student_attendance_record(
+    student_id: int,
+    classroom_id: int,
+    request: Request,
+    current_user: Dict = Depends(get_current_user),
+):
+    """Get attendance record for a specific student in a classroom"""
+    _get_owned_classroom(classroom_id, current_user, "access attendance")
+
+    etag = make_etag(request, current_user, Classroom.getVersion(classroom_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    records = Attendance.getClassroomRecords(classroom_id, student_id)
+    if not records:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Student with ID {student_id} is not enrolled in classroom with ID {classroom_id}",
+        )
+
+    return FastJSONResponse(records[0], headers=etag_headers(etag))
+
+
+@attendance_router.get(
+    "/classroom/{classroom_id}/records", response_model=List[StudentAttendanceRecord]
+)
+@cached(
+    tags=[
+        ("classrooms", "classroom_id"),
+        ("classroom_enrollments", None),
+        ("students", None),
+        ("class_sessions", None),
+        ("attendances", None),
+    ]
+)
+async def get_classroom_attendance_records(
+    classroom_id: int, request: Request, current_user: Dict = Depends(get_current_user)
+):
+    """Get attendance records for all students in a classroom"""
+    _get_owned_classroom(classroom_id, current_user, "access attendance")
+
+    etag = make_etag(request, current_user, Classroom.getVersion(classroom_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-# @attendance_router.post(
-#     "/", response_model=AttendanceResponse, status_code=status.HTTP_201_CREATED
-# )
-# async def create_attendance(
-#     attendance: AttendanceCreate,
-#     current_user: Dict = Depends(admin_or_instructor_required),
-# ):
-#     """Manually create/update attendance record"""
-#     # Check if session exists
-#     try:
-#         session = ClassSession.getById(attendance.session_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             classroom = Classroom.getById(session["classroom_id"])
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only manage attendance for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Session with ID {attendance.session_id} not found",
-#         )
-
-#     # Check if student exists and is enrolled
-#     try:
-#         student = Student.getById(attendance.student_id)
-
-#         # Check if student is enrolled in the classroom
-#         enrollments = ClassroomEnrollment.getAll()
-#         if not any(
-#             e["classroom_id"] == session["classroom_id"]
-#             and e["student_id"] == attendance.student_id
-#             for e in enrollments
-#         ):
-#             raise HTTPException(
-#                 status_code=status.HTTP_400_BAD_REQUEST,
-#                 detail="Student is not enrolled in this classroom",
-#             )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Student with ID {attendance.student_id} not found",
-#         )
-
-#     # Check if attendance record already exists
-#     attendances = Attendance.getAll()
-#     existing_attendance = next(
-#         (
-#             a
-#             for a in attendances
-#             if a["session_id"] == attendance.session_id
-#             and a["student_id"] == attendance.student_id
-#         ),
-#         None,
-#     )
-
-#     if existing_attendance:
-#         # Update existing attendance
-#         updated_attendance = Attendance.update(
-#             existing_attendance["attendance_id"],
-#             status=attendance.status,
-#             marked_by=attendance.marked_by,
-#         )
-#         return updated_attendance[0]
-#     else:
-#         # Create new attendance record
-#         created_attendance = Attendance.create(
-#             session_id=attendance.session_id,
-#             student_id=attendance.student_id,
-#             status=attendance.status,
-#             marked_by=attendance.marked_by,
-#         )
-#         return created_attendance[0]
-
-
-# @attendance_router.post("/process", response_model=ProcessAttendanceResponse)
-# async def process_attendance_with_face_recognition(
-#     request: ProcessAttendanceRequest,
-#     current_user: Dict = Depends(admin_or_instructor_required),
-# ):
-#     """Process attendance using face recognition"""
-#     # Check if session exists
-#     try:
-#         session = ClassSession.getById(request.session_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             classroom = Classroom.getById(session["classroom_id"])
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only manage attendance for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Session with ID {request.session_id} not found",
-#         )
-
-#     # Get all students enrolled in this classroom
-#     classroom_id = session["classroom_id"]
-#     enrollments = ClassroomEnrollment.getAll()
-#     classroom_enrollments = [
-#         e for e in enrollments if e["classroom_id"] == classroom_id
-#     ]
-
-#     # Get student data including face templates
-#     student_templates = []
-#     for enrollment in classroom_enrollments:
-#         try:
-#             student = Student.getById(enrollment["student_id"])
-#             # Only include students with face templates
-#             if student["face_template"]:
-#                 student_templates.append(student)
-#         except:
-#             continue
-
-#     # Process the image
-#     recognized_students = face_recognition.process_attendance_image(
-#         request.image_data, student_templates
-#     )
-
-#     # Mark attendance for recognized students
-#     attendances = []
-#     for student_info in recognized_students:
-#         # Create/update attendance record
-#         attendance_data = {
-#             "session_id": request.session_id,
-#             "student_id": student_info["student_id"],
-#             "status": "present",
-#             "marked_by": "system",
-#         }
-
-#         # Check if record already exists
-#         all_attendances = Attendance.getAll()
-#         existing = next(
-#             (
-#                 a
-#                 for a in all_attendances
-#                 if a["session_id"] == request.session_id
-#                 and a["student_id"] == student_info["student_id"]
-#             ),
-#             None,
-#         )
-
-#         if existing:
-#             # Update existing record
-#             updated = Attendance.update(
-#                 existing["attendance_id"], status="present", marked_by="system"
-#             )
-#             if updated:
-#                 attendances.append(updated[0])
-#         else:
-#             # Create new record
-#             created = Attendance.create(**attendance_data)
-#             if created:
-#                 attendances.append(created[0])
-
-#     return {
-#         "session_id": request.session_id,
-#         "processed_students": recognized_students,
-#         "attendances": attendances,
-#     }
-
-
-# @attendance_router.get(
-#     "/sessions/{session_id}", response_model=List[AttendanceResponse]
-# )
-# async def get_session_attendance(
-#     session_id: int, current_user: Dict = Depends(get_current_user)
-# ):
-#     """Get all attendance records for a session"""
-#     # Check if session exists
-#     try:
-#         session = ClassSession.getById(session_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             classroom = Classroom.getById(session["classroom_id"])
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only access attendance for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Session with ID {session_id} not found",
-#         )
-
-#     # Get attendance records
-#     attendances = Attendance.getAll()
-#     session_attendances = [a for a in attendances if a["session_id"] == session_id]
-
-#     return session_attendances
-
-
-# @attendance_router.put("/{attendance_id}", response_model=AttendanceResponse)
-# async def update_attendance(
-#     attendance_id: int,
-#     attendance: AttendanceUpdate,
-#     current_user: Dict = Depends(admin_or_instructor_required),
-# ):
-#     """Update an attendance record"""
-#     # Check if attendance record exists
-#     try:
-#         existing_attendance = Attendance.getById(attendance_id)
-
-#         # Get session to check classroom ownership
-#         session = ClassSession.getById(existing_attendance["session_id"])
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             classroom = Classroom.getById(session["classroom_id"])
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only update attendance for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Attendance record with ID {attendance_id} not found",
-#         )
-
-#     # Update attendance record
-#     updated_attendance = Attendance.update(
-#         attendance_id,
-#         status=attendance.status,
-#         marked_by=attendance.marked_by,
-#     )
-
-#     return updated_attendance[0]
-
-
-# @attendance_router.delete("/{attendance_id}", status_code=status.HTTP_204_NO_CONTENT)
-# async def delete_attendance(
-#     attendance_id: int, current_user: Dict = Depends(admin_or_instructor_required)
-# ):
-#     """Delete an attendance record"""
-#     try:
-#         # Get attendance record first
-#         existing_attendance = Attendance.getById(attendance_id)
-
-#         # Get session to check classroom ownership
-#         session = ClassSession.getById(existing_attendance["session_id"])
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             classroom = Classroom.getById(session["classroom_id"])
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only delete attendance for your own classrooms",
-#                 )
-
-#         # Delete attendance record
-#         Attendance.delete(attendance_id)
-#         return None
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Attendance record with ID {attendance_id} not found",
-#         )
-
-
-# @attendance_router.get(
-#     "/classroom/{classroom_id}/stats", response_model=AttendanceStats
-# )
-# async def get_classroom_attendance_stats(
-#     classroom_id: int, current_user: Dict = Depends(get_current_user)
-# ):
-#     """Get attendance statistics for a classroom"""
-#     # Check if classroom exists
-#     try:
-#         classroom = Classroom.getById(classroom_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only access stats for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Classroom with ID {classroom_id} not found",
-#         )
-
-#     # Get all sessions for this classroom
-#     sessions = ClassSession.getAll()
-#     classroom_sessions = [s for s in sessions if s["classroom_id"] == classroom_id]
-
-#     # Get all enrollments for this classroom
-#     enrollments = ClassroomEnrollment.getAll()
-#     classroom_enrollments = [
-#         e for e in enrollments if e["classroom_id"] == classroom_id
-#     ]
-
-#     # Get all attendance records for classroom sessions
-#     attendances = Attendance.getAll()
-#     classroom_attendances = [
-#         a
-#         for a in attendances
-#         if any(s["session_id"] == a["session_id"] for s in classroom_sessions)
-#     ]
-
-#     # Calculate statistics
-#     total_sessions = len(classroom_sessions)
-#     total_students = len(classroom_enrollments)
-#     present_count = len([a for a in classroom_attendances if a["status"] == "present"])
-#     absent_count = len([a for a in classroom_attendances if a["status"] == "absent"])
-
-#     # Calculate attendance rate
-#     total_possible_attendances = total_sessions * total_students
-#     attendance_rate = (
-#         (present_count / total_possible_attendances) * 100
-#         if total_possible_attendances > 0
-#         else 0
-#     )
-
-#     return {
-#         "total_sessions": total_sessions,
-#         "total_students": total_students,
-#         "present_count": present_count,
-#         "absent_count": absent_count,
-#         "attendance_rate": attendance_rate,
-#     }
-
-
-# @attendance_router.get(
-#     "/student/{student_id}/classroom/{classroom_id}",
-#     response_model=StudentAttendanceRecord,
-# )
-# async def get_student_attendance_record(
-#     student_id: int, classroom_id: int, current_user: Dict = Depends(get_current_user)
-# ):
-#     """Get attendance record for a specific student in a classroom"""
-#     # Check if classroom exists
-#     try:
-#         classroom = Classroom.getById(classroom_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only access attendance for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Classroom with ID {classroom_id} not found",
-#         )
-
-#     # Check if student exists
-#     try:
-#         student = Student.getById(student_id)
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Student with ID {student_id} not found",
-#         )
-
-#     # Check if student is enrolled in classroom
-#     enrollments = ClassroomEnrollment.getAll()
-#     if not any(
-#         e["classroom_id"] == classroom_id and e["student_id"] == student_id
-#         for e in enrollments
-#     ):
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Student with ID {student_id} is not enrolled in classroom with ID {classroom_id}",
-#         )
-
-#     # Get all sessions for this classroom
-#     sessions = ClassSession.getAll()
-#     classroom_sessions = [s for s in sessions if s["classroom_id"] == classroom_id]
-
-#     # Get all attendance records for this student in this classroom
-#     attendances = Attendance.getAll()
-#     student_attendances = [
-#         a
-#         for a in attendances
-#         if a["student_id"] == student_id
-#         and any(s["session_id"] == a["session_id"] for s in classroom_sessions)
-#     ]
-
-#     # Calculate statistics
-#     present_count = len([a for a in student_attendances if a["status"] == "present"])
-#     absent_count = len([a for a in student_attendances if a["status"] == "absent"])
-#     total_sessions = len(classroom_sessions)
-
-#     # Calculate attendance rate
-#     attendance_rate = (
-#         (present_count / total_sessions) * 100 if total_sessions > 0 else 0
-#     )
-
-#     return {
-#         "student_id": student_id,
-#         "student_name": student["name"],
-#         "present_count": present_count,
-#         "absent_count": absent_count,
-#         "attendance_rate": attendance_rate,
-#     }
-
-
-# @attendance_router.get(
-#     "/classroom/{classroom_id}/records", response_model=List[StudentAttendanceRecord]
-# )
-# async def get_classroom_attendance_records(
-#     classroom_id: int, current_user: Dict = Depends(get_current_user)
-# ):
-#     """Get attendance records for all students in a classroom"""
-#     # Check if classroom exists
-#     try:
-#         classroom = Classroom.getById(classroom_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only access attendance for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Classroom with ID {classroom_id} not found",
-#         )
-
-#     # Get all enrollments for this classroom
-#     enrollments = ClassroomEnrollment.getAll()
-#     classroom_enrollments = [
-#         e for e in enrollments if e["classroom_id"] == classroom_id
-#     ]
-
-#     # Get all sessions for this classroom
-#     sessions = ClassSession.getAll()
-#     classroom_sessions = [s for s in sessions if s["classroom_id"] == classroom_id]
-#     total_sessions = len(classroom_sessions)
-
-#     # Get all attendance records for classroom sessions
-#     attendances = Attendance.getAll()
-
-#     # Get all students
-#     students = Student.getAll()
-
-#     # Calculate attendance records for each enrolled student
-#     student_records = []
-#     for enrollment in classroom_enrollments:
-#         student_id = enrollment["student_id"]
-#         student = next((s for s in students if s["student_id"] == student_id), None)
-
-#         if student:
-#             # Get attendance records for this student
-#             student_attendances = [
-#                 a
-#                 for a in attendances
-#                 if a["student_id"] == student_id
-#                 and any(s["session_id"] == a["session_id"] for s in classroom_sessions)
-#             ]
-
-#             present_count = len(
-#                 [a for a in student_attendances if a["status"] == "present"]
-#             )
-#             absent_count = len(
-#                 [a for a in student_attendances if a["status"] == "absent"]
-#             )
-
-#             # Calculate attendance rate
-#             attendance_rate = (
-#                 (present_count / total_sessions) * 100 if total_sessions > 0 else 0
-#             )
-
-#             student_records.append(
-#                 {
-#                     "student_id": student_id,
-#                     "student_name": student["name"],
-#                     "present_count": present_count,
-#                     "absent_count": absent_count,
-#                     "attendance_rate": attendance_rate,
-#                 }
-#             )
-
-#     return student_records
-
-
-# @attendance_router.post("/mark-absences/{session_id}", status_code=status.HTTP_200_OK)
-# async def mark_absent_students(
-#     session_id: int, current_user: Dict = Depends(admin_or_instructor_required)
-# ):
-#     """Mark all students without attendance records as absent"""
-#     # Check if session exists
-#     try:
-#         session = ClassSession.getById(session_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             classroom = Classroom.getById(session["classroom_id"])
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only manage attendance for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Session with ID {session_id} not found",
-#         )
-
-#     # Get classroom ID
-#     classroom_id = session["classroom_id"]
-
-#     # Get all students enrolled in this classroom
-#     enrollments = ClassroomEnrollment.getAll()
-#     classroom_enrollments = [
-#         e for e in enrollments if e["classroom_id"] == classroom_id
-#     ]
-
-#     # Get existing attendance records for this session
-#     attendances = Attendance.getAll()
-#     session_attendances = [a for a in attendances if a["session_id"] == session_id]
-
-#     # Get student IDs with existing attendance
-#     students_with_attendance = [a["student_id"] for a in session_attendances]
-
-#     # Mark absent for students without attendance records
-#     created_records = []
-#     for enrollment in classroom_enrollments:
-#         student_id = enrollment["student_id"]
-
-#         # Skip if student already has an attendance record
-#         if student_id in students_with_attendance:
-#             continue
-
-#         # Create absent record
-#         attendance_data = {
-#             "session_id": session_id,
-#             "student_id": student_id,
-#             "status": "absent",
-#             "marked_by": (
-#                 "instructor" if current_user["role"] == "instructor" else "admin"
-#             ),
-#         }
-
-#         created = Attendance.create(**attendance_data)
-#         if created:
-#             created_records.append(created[0])
-
-#     return {"session_id": session_id, "absent_records_created": len(created_records)}
-
-
-# @attendance_router.get("/session/{session_id}/stats", response_model=AttendanceStats)
-# async def get_session_attendance_stats(
-#     session_id: int, current_user: Dict = Depends(get_current_user)
-# ):
-#     """Get attendance statistics for a specific session"""
-#     # Check if session exists
-#     try:
-#         session = ClassSession.getById(session_id)
-
-#         # If instructor, check if they own the classroom
-#         if current_user["role"] == "instructor":
-#             classroom = Classroom.getById(session["classroom_id"])
-#             if classroom["instructor_id"] != current_user["user_id"]:
-#                 raise HTTPException(
-#                     status_code=status.HTTP_403_FORBIDDEN,
-#                     detail="You can only access stats for your own classrooms",
-#                 )
-#     except:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Session with ID {session_id} not found",
-#         )
-
-#     # Get classroom ID
-#     classroom_id = session["classroom_id"]
-
-#     # Get all students enrolled in this classroom
-#     enrollments = ClassroomEnrollment.getAll()
-#     classroom_enrollments = [
-#         e for e in enrollments if e["classroom_id"] == classroom_id
-#     ]
-#     total_students = len(classroom_enrollments)
-
-#     # Get attendance records for this session
-#     attendances = Attendance.getAll()
-#     session_attendances = [a for a in attendances if a["session_id"] == session_id]
-
-#     # Calculate statistics
-#     present_count = len([a for a in session_attendances if a["status"] == "present"])
-#     absent_count = len([a for a in session_attendances if a["status"] == "absent"])
-
-#     # Calculate attendance rate
-#     attendance_rate = (
-#         (present_count / total_students) * 100 if total_students > 0 else 0
-#     )
-
-#     return {
-#         "total_sessions": 1,  # Always 1 for a single session
-#         "total_students": total_students,
-#         "present_count": present_count,
-#         "absent_count": absent_count,
-#         "attendance_rate": attendance_rate,
-#     }
+    return fast_response(
+        Attendance.getClassroomRecords(classroom_id),
+        StudentAttendanceRecord,
+        headers=etag_headers(etag),
+    )
+
+
+@attendance_router.get(
+    "/classroom/{classroom_id}/matrix", response_model=AttendanceMatrix
+)
+@cached(
+    tags=[
+        ("classrooms", "classroom_id"),
+        ("classroom_enrollments", None),
+        ("students", None),
+        ("class_sessions", None),
+        ("attendances", None),
+    ]
+)
+async def get_classroom_attendance_matrix(
+    classroom_id: int,
+    request: Request,
+    current_user: Dict = Depends(get_current_user),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """Get a classroom's attendance as a compact students x sessions matrix"""
+    _get_owned_classroom(classroom_id, current_user, "access attendance")
+
+    etag = make_etag(request, current_user, Classroom.getVersion(classroom_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    matrix = Attendance.getClassroomMatrix(
+        classroom_id, start_date=start_date, end_date=end_date
+    )
+    return FastJSONResponse(matrix, headers=etag_headers(etag))
+
+
+@attendance_router.get("/classroom/{classroom_id}/export")
+async def export_classroom_attendance(
+    classroom_id: int,
+    current_user: Dict = Depends(get_current_user),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    status_filter: Optional[AttendanceStatusEnum] = Query(None, alias="status"),
+    gzip: bool = False,
+):
+    """Stream a classroom's attendance records as CSV"""
+    classroom = _get_owned_classroom(classroom_id, current_user, "export attendance")
+
+    batches = Attendance.streamClassroomExport(
+        classroom_id,
+        start_date=start_date,
+        end_date=end_date,
+        status=status_filter.value if status_filter else None,
+    )
+
+    filename = f"classroom_{classroom['classroom_id']}_attendance.csv"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        _csv_stream(batches, compress=gzip),
+        media_type="text/csv",
+        headers=headers,
+    )
+
+
+@attendance_router.post("/mark-absences/{session_id}", status_code=status.HTTP_200_OK)
+async def mark_absent_students(
+    session_id: int, current_user: Dict = Depends(admin_or_instructor_required)
+):
+    """Mark all students without attendance records as absent"""
+    _get_owned_session(session_id, current_user, "manage attendance")
+
+    # The schema only records manual marks as "instructor", admins included
+    absent_records_created = Attendance.markAbsences(
+        session_id, MarkedByEnum.INSTRUCTOR.value
+    )
+
+    return {"session_id": session_id, "absent_records_created": absent_records_created}
+
+
+@attendance_router.get("/session/{session_id}/stats", response_model=AttendanceStats)
+@cached(
+    tags=[
+        ("class_sessions", "session_id"),
+        ("classrooms", None),
+        ("classroom_enrollments", None),
+        ("attendances", None),
+    ]
+)
+async def get_session_attendance_stats(
+    session_id: int, request: Request, current_user: Dict = Depends(get_current_user)
+):
+    """Get attendance statistics for a specific session"""
+    session = _get_owned_session(session_id, current_user, "access stats")
+
+    etag = make_etag(
+        request,
+        current_user,
+        ClassSession.getAttendanceVersion(session_id, session["classroom_id"]),
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    stats = Attendance.getSessionStats(session_id, session["classroom_id"])
+    return FastJSONResponse(stats, headers=etag_headers(etag))
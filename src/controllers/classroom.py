@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from typing import List, Dict, Optional
+from datetime import date, datetime
 
 from ..models.student import Student
 from ..models.classroom_enrollment import ClassroomEnrollment
@@ -9,6 +10,10 @@ from ..schemas import (
     ClassroomCreate,
     ClassroomResponse,
     ClassroomUpdate,
+    ClassroomDashboardCard,
+    ClassroomDetail,
+    ClassroomChanges,
+    AttendanceStatusEnum,
     EnrollmentCreate,
     EnrollmentResponse,
     BulkEnrollmentCreate,
@@ -22,10 +27,45 @@ from ..utils.auth import (
     get_current_user,
     instructor_required,
 )
+from ..utils.responses import (
+    FastJSONResponse,
+    changes_response,
+    fast_response,
+    sparse_fields,
+    sparse_model,
+    model_field_names,
+    project_row,
+)
+from ..utils.etag import etag_headers, is_not_modified, make_etag, not_modified
+from ..utils.cache import cached
+from ..utils.idempotency import idempotent
 
 classroom_router = APIRouter(prefix="/classrooms", tags=["Classrooms"])
 
 
+def _get_accessible_classroom(classroom_id: int, current_user: Dict) -> Dict:
+    """Fetch a classroom and check that an instructor owns it"""
+    try:
+        classroom = Classroom.getById(classroom_id)
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Classroom with ID {classroom_id} not found",
+        )
+
+    # Check if instructor is accessing their own classroom
+    if (
+        current_user["role"] == "instructor"
+        and classroom["instructor_id"] != current_user["user_id"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only access your own classrooms",
+        )
+
+    return classroom
+
+
 @classroom_router.post(
     "/", response_model=ClassroomResponse, status_code=status.HTTP_201_CREATED
 )
@@ -63,60 +103,118 @@ async def create_classroom(
     return created_classroom[0]
 
 
-@classroom_router.get("/", response_model=List[ClassroomResponse])
+@classroom_router.get("/", response_model=List[sparse_model(ClassroomResponse)])
+@cached(tags=[("classrooms", None)])
 async def get_classrooms(
+    request: Request,
     current_user: Dict = Depends(get_current_user),
     year: Optional[int] = None,
     semester: Optional[str] = None,
     instructor_id: Optional[int] = None,
     is_active: Optional[bool] = None,
+    fields: List[str] = Depends(sparse_fields(ClassroomResponse)),
 ):
     """Get all classrooms with optional filters"""
-    classrooms = Classroom.getAll()
-
-    # Apply filters if provided
-    if year:
-        classrooms = [c for c in classrooms if c["year"] == year]
-    if semester:
-        classrooms = [c for c in classrooms if c["semester"] == semester]
-    if instructor_id:
-        classrooms = [c for c in classrooms if c["instructor_id"] == instructor_id]
-    if is_active is not None:
-        classrooms = [c for c in classrooms if c["is_active"] == is_active]
+    etag = make_etag(
+        request,
+        current_user,
+        Classroom.getListVersion(
+            current_user["user_id"] if current_user["role"] == "instructor" else None
+        ),
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
     # For instructors, only show their classrooms
     if current_user["role"] == "instructor":
-        classrooms = [
-            c for c in classrooms if c["instructor_id"] == current_user["user_id"]
-        ]
+        if instructor_id and instructor_id != current_user["user_id"]:
+            return fast_response([], headers=etag_headers(etag))
+        instructor_id = current_user["user_id"]
+
+    # Filters are applied in SQL; falsy values mean "no filter" as before
+    classrooms = Classroom.getAll(
+        columns=fields,
+        year=year or None,
+        semester=semester or None,
+        instructor_id=instructor_id or None,
+        is_active=is_active,
+    )
+
+    return fast_response(
+        classrooms, ClassroomResponse, headers=etag_headers(etag), fields=fields
+    )
+
+
+@classroom_router.get("/dashboard", response_model=List[ClassroomDashboardCard])
+@cached(
+    tags=[
+        ("classrooms", None),
+        ("classroom_enrollments", None),
+        ("class_sessions", None),
+        ("attendances", None),
+    ],
+    # Next/latest session move with the clock, like the ETag's minute bucket
+    bucket_seconds=60,
+)
+async def get_classroom_dashboard(
+    request: Request,
+    current_user: Dict = Depends(get_current_user),
+    instructor_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+):
+    """Get classroom cards with student counts, next session and latest attendance rate"""
+    # For instructors, only show their classrooms
+    if current_user["role"] == "instructor":
+        instructor_id = current_user["user_id"]
+
+    etag = make_etag(
+        request,
+        current_user,
+        Classroom.getListVersion(instructor_id, include_related=True),
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return fast_response(
+        Classroom.getDashboard(instructor_id=instructor_id, is_active=is_active),
+        ClassroomDashboardCard,
+        headers=etag_headers(etag),
+    )
+
+
+@classroom_router.get("/changes", response_model=ClassroomChanges)
+async def get_classroom_changes(
+    current_user: Dict = Depends(get_current_user), since: Optional[datetime] = None
+):
+    """Get classrooms changed or deleted since a timestamp (all if omitted)"""
+    # For instructors, only sync their classrooms
+    instructor_id = (
+        current_user["user_id"] if current_user["role"] == "instructor" else None
+    )
 
-    return classrooms
+    until = Classroom.getSyncWatermark()
+    changed = Classroom.getChangedSince(since, instructor_id=instructor_id)
+    deleted = Classroom.getDeletedSince(since, instructor_id) if since else []
+
+    return changes_response(since, until, changed, deleted, ClassroomResponse)
 
 
 @classroom_router.get("/{classroom_id}", response_model=ClassroomResponse)
+@cached(tags=[("classrooms", "classroom_id")])
 async def get_classroom(
-    classroom_id: int, current_user: Dict = Depends(get_current_user)
+    classroom_id: int, request: Request, current_user: Dict = Depends(get_current_user)
 ):
     """Get classroom by ID"""
-    try:
-        classroom = Classroom.getById(classroom_id)
+    classroom = _get_accessible_classroom(classroom_id, current_user)
 
-        # Check if instructor is accessing their own classroom
-        if (
-            current_user["role"] == "instructor"
-            and classroom["instructor_id"] != current_user["user_id"]
-        ):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only access your own classrooms",
-            )
+    etag = make_etag(request, current_user, str(classroom["updated_at"]))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-        return classroom
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Classroom with ID {classroom_id} not found",
-        )
+    return FastJSONResponse(
+        project_row(classroom, model_field_names(ClassroomResponse)),
+        headers=etag_headers(etag),
+    )
 
 
 @classroom_router.put("/{classroom_id}", response_model=ClassroomResponse)
@@ -252,6 +350,7 @@ async def create_enrollment(
     response_model=List[EnrollmentResponse],
     status_code=status.HTTP_201_CREATED,
 )
+@idempotent(status_code=status.HTTP_201_CREATED)
 async def create_bulk_enrollments(
     enrollment_data: BulkEnrollmentCreate,
     current_user: Dict = Depends(admin_or_instructor_required),
@@ -308,46 +407,89 @@ async def create_bulk_enrollments(
     return created_enrollments
 
 
-@classroom_router.get("/{classroom_id}/students", response_model=List[StudentResponse])
+@classroom_router.get(
+    "/{classroom_id}/students", response_model=List[sparse_model(StudentResponse)]
+)
+@cached(
+    tags=[
+        ("classrooms", "classroom_id"),
+        ("classroom_enrollments", None),
+        ("students", None),
+    ]
+)
 async def get_classroom_students(
-    classroom_id: int, current_user: Dict = Depends(get_current_user)
+    classroom_id: int,
+    request: Request,
+    current_user: Dict = Depends(get_current_user),
+    fields: List[str] = Depends(sparse_fields(StudentResponse)),
 ):
     """Get all students enrolled in a classroom"""
-    # Check if classroom exists
-    try:
-        classroom = Classroom.getById(classroom_id)
+    _get_accessible_classroom(classroom_id, current_user)
 
-        # Check if instructor is accessing their own classroom
-        if (
-            current_user["role"] == "instructor"
-            and classroom["instructor_id"] != current_user["user_id"]
-        ):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only access your own classrooms",
-            )
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Classroom with ID {classroom_id} not found",
-        )
+    etag = make_etag(request, current_user, Classroom.getVersion(classroom_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-    # Get enrollments for this classroom
-    enrollments = ClassroomEnrollment.getAll()
-    classroom_enrollments = [
-        e for e in enrollments if e["classroom_id"] == classroom_id
+    students = Student.getByClassroom(classroom_id, columns=fields)
+
+    return fast_response(
+        students, StudentResponse, headers=etag_headers(etag), fields=fields
+    )
+
+
+@classroom_router.get("/{classroom_id}/detail", response_model=ClassroomDetail)
+@cached(
+    tags=[
+        ("classrooms", "classroom_id"),
+        ("classroom_enrollments", None),
+        ("students", None),
+        ("class_sessions", None),
+        ("attendances", None),
     ]
+)
+async def get_classroom_detail(
+    classroom_id: int,
+    request: Request,
+    current_user: Dict = Depends(get_current_user),
+    q: Optional[str] = None,
+    month: Optional[str] = None,
+    status_filter: Optional[AttendanceStatusEnum] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Get classroom stats and a filtered page of students with their attendance"""
+    _get_accessible_classroom(classroom_id, current_user)
+
+    etag = make_etag(request, current_user, Classroom.getVersion(classroom_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-    # Get students
-    students = []
-    for enrollment in classroom_enrollments:
+    # Turn "YYYY-MM" into a half-open date range on session_date
+    month_start = month_end = None
+    if month:
         try:
-            student = Student.getById(enrollment["student_id"])
-            students.append(student)
-        except:
-            continue
+            month_start = datetime.strptime(month, "%Y-%m").date()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Month must be formatted as YYYY-MM",
+            )
+        month_end = (
+            date(month_start.year + 1, 1, 1)
+            if month_start.month == 12
+            else date(month_start.year, month_start.month + 1, 1)
+        )
 
-    return students
+    detail = Classroom.getDetail(
+        classroom_id,
+        q=q or None,
+        month_start=month_start,
+        month_end=month_end,
+        status=status_filter.value if status_filter else None,
+        limit=limit,
+        offset=offset,
+    )
+    return FastJSONResponse(detail, headers=etag_headers(etag))
 
 
 @classroom_router.delete(
@@ -422,36 +564,28 @@ async def create_class_session(
 
 
 @classroom_router.get(
-    "/{classroom_id}/sessions", response_model=List[ClassSessionResponse]
+    "/{classroom_id}/sessions",
+    response_model=List[sparse_model(ClassSessionResponse)],
 )
+@cached(tags=[("classrooms", "classroom_id"), ("class_sessions", None)])
 async def get_classroom_sessions(
-    classroom_id: int, current_user: Dict = Depends(get_current_user)
+    classroom_id: int,
+    request: Request,
+    current_user: Dict = Depends(get_current_user),
+    fields: List[str] = Depends(sparse_fields(ClassSessionResponse)),
 ):
     """Get all sessions for a classroom"""
-    # Check if classroom exists
-    try:
-        classroom = Classroom.getById(classroom_id)
+    _get_accessible_classroom(classroom_id, current_user)
 
-        # Check if instructor is accessing their own classroom
-        if (
-            current_user["role"] == "instructor"
-            and classroom["instructor_id"] != current_user["user_id"]
-        ):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only access your own classrooms",
-            )
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Classroom with ID {classroom_id} not found",
-        )
+    etag = make_etag(request, current_user, Classroom.getVersion(classroom_id))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-    # Get all sessions
-    sessions = ClassSession.getAll()
-    classroom_sessions = [s for s in sessions if s["classroom_id"] == classroom_id]
+    sessions = ClassSession.getAll(columns=fields, classroom_id=classroom_id)
 
-    return classroom_sessions
+    return fast_response(
+        sessions, ClassSessionResponse, headers=etag_headers(etag), fields=fields
+    )
 
 
 @classroom_router.put("/sessions/{session_id}", response_model=ClassSessionResponse)
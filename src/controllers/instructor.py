@@ -3,6 +3,7 @@ from typing import List, Dict
 
 from ..models.instructor import Instructor
 from ..schemas import InstructorCreate, InstructorResponse
+from ..utils.responses import fast_response, sparse_fields, sparse_model
 from ..utils.auth import (
     hash_password,
     admin_required,
@@ -38,11 +39,14 @@ async def create_instructor(
     return created_instructor[0]
 
 
-@instructor_router.get("/", response_model=List[InstructorResponse])
-async def get_instructors(current_user: Dict = Depends(get_current_user)):
+@instructor_router.get("/", response_model=List[sparse_model(InstructorResponse)])
+async def get_instructors(
+    current_user: Dict = Depends(get_current_user),
+    fields: List[str] = Depends(sparse_fields(InstructorResponse)),
+):
     """Get all instructors (any authenticated user)"""
-    instructors = Instructor.getAll()
-    return instructors
+    instructors = Instructor.getAll(columns=fields)
+    return fast_response(instructors, InstructorResponse, fields=fields)
 
 
 @instructor_router.get("/{instructor_id}", response_model=InstructorResponse)
@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException, status, Depends, File, UploadFile, Form
 from typing import List, Dict, Optional
+from datetime import datetime
 import base64
 import io
 
 from ..models.student import Student
-from ..schemas import StudentCreate, StudentResponse, StudentUpdate
+from ..schemas import StudentCreate, StudentResponse, StudentUpdate, StudentChanges
 from ..utils.auth import admin_or_instructor_required, get_current_user
+from ..utils.responses import (
+    changes_response,
+    fast_response,
+    sparse_fields,
+    sparse_model,
+)
 
 # from ..utils.face import face_recognition
 
@@ -70,17 +77,28 @@ async def upload_face_template(
     #     )
 
 
-@student_router.get("/", response_model=List[StudentResponse])
+@student_router.get("/", response_model=List[sparse_model(StudentResponse)])
 async def get_students(
-    current_user: Dict = Depends(get_current_user), department: Optional[str] = None
+    current_user: Dict = Depends(get_current_user),
+    department: Optional[str] = None,
+    fields: List[str] = Depends(sparse_fields(StudentResponse)),
 ):
     """Get all students with optional department filter"""
-    students = Student.getAll()
+    students = Student.getAll(columns=fields, department=department or None)
+
+    return fast_response(students, StudentResponse, fields=fields)
 
-    if department:
-        students = [s for s in students if s["department"] == department]
 
-    return students
+@student_router.get("/changes", response_model=StudentChanges)
+async def get_student_changes(
+    current_user: Dict = Depends(get_current_user), since: Optional[datetime] = None
+):
+    """Get students changed or deleted since a timestamp (all students if omitted)"""
+    until = Student.getSyncWatermark()
+    changed = Student.getChangedSince(since)
+    deleted = Student.getDeletedSince(since) if since else []
+
+    return changes_response(since, until, changed, deleted, StudentResponse)
 
 
 @student_router.get("/{student_id}", response_model=StudentResponse)
@@ -17,18 +17,22 @@ class DatabaseConnection:
             return
 
         try:
-            self.connection = connect(
-                dbname=os.getenv("snapattend"),
-                user=os.getenv("mhmd"),
-                password=os.getenv("1234"),
-                host=os.getenv("127.0.0.1"),
-                port=os.getenv("5432"),
-            )
+            self.connection = self.open_connection()
             self.cursor = self.connection.cursor(cursor_factory=RealDictCursor)
             print("Connected to database")
         except Exception as e:
             raise ConnectionError(f"Failed to connect to database: {e}")
 
+    def open_connection(self):
+        """Opens a new connection using the configured credentials"""
+        return connect(
+            dbname=os.getenv("snapattend"),
+            user=os.getenv("mhmd"),
+            password=os.getenv("1234"),
+            host=os.getenv("127.0.0.1"),
+            port=os.getenv("5432"),
+        )
+
     def disconnect(self):
         """Closes database connection"""
         if self.cursor:
@@ -38,18 +42,45 @@ class DatabaseConnection:
         self.cursor = None
         self.connection = None
 
-    def execute_query(self, query, params=None):
-        """Executes a query and returns results"""
+    def execute_query(self, query, params=None, notify=None):
+        """Executes a query and returns results
+
+        `notify` maps the results to (channel, payload) pairs that are sent
+        with pg_notify in the same transaction, so listeners only hear about
+        committed changes.
+        """
         if not self.cursor:
             self.connect()
 
         try:
             self.cursor.execute(query, params)
+            results = self.cursor.fetchall() if self.cursor.description else None
+            for channel, payload in notify(results) if notify else ():
+                self.cursor.execute("SELECT pg_notify(%s, %s)", [channel, payload])
             self.connection.commit()
-            return self.cursor.fetchall() if self.cursor.description else None
+            return results
         except Exception as e:
             self.connection.rollback()
             raise Exception(f"Query execution failed: {e}")
 
+    def stream_query(self, query, params=None, batch_size=1000):
+        """Yields query results in batches from a server-side cursor.
+
+        Runs on its own connection so that commits made by other requests
+        on the shared connection cannot close the cursor mid-stream.
+        """
+        connection = self.open_connection()
+        try:
+            with connection.cursor(name="stream_query") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            connection.close()
+
 
 db = DatabaseConnection()
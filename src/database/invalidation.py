@@ -0,0 +1,70 @@
+import json
+import os
+import socket
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+# NOTIFY channel shared by every worker
+CHANNEL = "cache_invalidation"
+
+# Above this many keys an event evicts the whole table instead; NOTIFY
+# payloads are capped at 8000 bytes
+MAX_KEYS = 500
+
+# Identifies this process so it can skip the echo of its own events
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class InvalidationBus:
+    """Routes table/key change events to cache eviction handlers.
+
+    A handler receives the changed primary keys of its table, or None when
+    the whole table must be considered stale.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[Optional[list]], None]]] = (
+            defaultdict(list)
+        )
+        self._lock = threading.Lock()
+
+    def subscribe(self, table: str, handler: Callable[[Optional[list]], None]):
+        """Call `handler` whenever records of `table` change"""
+        with self._lock:
+            self._handlers[table].append(handler)
+
+    def dispatch(self, event: dict):
+        """Run the handlers of a change event"""
+        with self._lock:
+            handlers = list(self._handlers.get(event["table"], ()))
+
+        for handler in handlers:
+            try:
+                handler(event.get("keys"))
+            except Exception as e:
+                print(f"Cache invalidation handler failed for {event['table']}: {e}")
+
+    def dispatch_remote(self, event: dict):
+        """Run the handlers of an event received over NOTIFY"""
+        # Our own writes were already dispatched right after commit
+        if event.get("origin") != ORIGIN:
+            self.dispatch(event)
+
+
+def make_event(table: str, rows=None, key_column: Optional[str] = None) -> dict:
+    """Build the change event for the rows returned by a write"""
+    keys = None
+    if key_column and rows is not None:
+        keys = [row[key_column] for row in rows]
+        if len(keys) > MAX_KEYS:
+            keys = None
+    return {"table": table, "keys": keys, "origin": ORIGIN}
+
+
+def encode_event(event: dict) -> str:
+    """Serialize an event as a NOTIFY payload"""
+    return json.dumps(event, default=str)
+
+
+invalidation_bus = InvalidationBus()
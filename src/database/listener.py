@@ -0,0 +1,84 @@
+import json
+import select
+import threading
+from typing import Callable, Dict
+
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from .connection import db
+
+
+class NotificationListener:
+    """Relays Postgres NOTIFY payloads to handlers on a background thread.
+
+    Uses its own autocommit connection so LISTEN is never interrupted by the
+    commits and rollbacks of the shared request connection. Notifications
+    sent while the connection is down are lost; consumers are expected to
+    resync (for example through the /changes endpoints) when they reconnect.
+    """
+
+    def __init__(self, poll_interval: float = 5.0, retry_interval: float = 2.0):
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self._handlers: Dict[str, Callable[[dict], None]] = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def register(self, channel: str, handler: Callable[[dict], None]):
+        """Call `handler` with the decoded JSON payload of each notification"""
+        self._handlers[channel] = handler
+
+    def start(self):
+        """Start listening in a daemon thread"""
+        if self._thread is not None or not self._handlers:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="notification-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the listener thread"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+        self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = db.open_connection()
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    for channel in self._handlers:
+                        cursor.execute(
+                            sql.SQL("LISTEN {}").format(sql.Identifier(channel))
+                        )
+                self._listen(connection)
+            except Exception as e:
+                print(f"Notification listener error: {e}")
+                self._stopped.wait(self.retry_interval)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _listen(self, connection):
+        while not self._stopped.is_set():
+            if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                handler = self._handlers.get(notify.channel)
+                if handler is None:
+                    continue
+                try:
+                    handler(json.loads(notify.payload))
+                except Exception as e:
+                    print(f"Failed to handle {notify.channel} notification: {e}")
+
+
+listener = NotificationListener()
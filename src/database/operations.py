@@ -1,10 +1,25 @@
 from psycopg2 import sql
 from .connection import db
+from .invalidation import CHANNEL, encode_event, invalidation_bus, make_event
 
 
 class DatabaseOperations:
     @staticmethod
-    def create_record(table: str, data: dict):
+    def _write(query, params, table: str, key_column: str = None):
+        """Runs a write and announces the changed keys to every worker"""
+        events = []
+
+        def notify(rows):
+            events.append(make_event(table, rows, key_column))
+            return [(CHANNEL, encode_event(events[-1]))]
+
+        results = db.execute_query(query, params, notify=notify)
+        for event in events:
+            invalidation_bus.dispatch(event)
+        return results
+
+    @staticmethod
+    def create_record(table: str, data: dict, key_column: str = None):
         """Creates a new record in the specified table"""
         columns = list(data.keys())
         values = list(data.values())
@@ -17,29 +32,47 @@ class DatabaseOperations:
             placeholders=sql.SQL(", ").join(sql.Placeholder() for _ in values),
         )
 
-        return db.execute_query(query, values)
+        return DatabaseOperations._write(query, values, table, key_column)
 
     @staticmethod
-    def read_records(table: str, columns="*", conditions=None, limit=None):
-        """Reads records from the specified table"""
+    def read_records(
+        table: str, columns="*", conditions=None, limit=None, params=None
+    ):
+        """Reads records from the specified table
+
+        `columns` is either raw SQL or a list of column names to project.
+        `conditions` is either raw SQL or a composed clause using named
+        placeholders filled from `params`.
+        """
+        if isinstance(columns, (list, tuple)):
+            columns = sql.SQL(", ").join(map(sql.Identifier, columns))
+        else:
+            columns = sql.SQL(columns)
+
         query = sql.SQL("SELECT {columns} FROM {table}").format(
-            columns=sql.SQL(columns) if columns != "*" else sql.SQL("*"),
-            table=sql.Identifier(table),
+            columns=columns, table=sql.Identifier(table)
         )
+        params = dict(params or {})
 
         if conditions:
+            if isinstance(conditions, str):
+                conditions = sql.SQL(conditions)
             query = query + sql.SQL(" WHERE {conditions}").format(
-                conditions=sql.SQL(conditions)
+                conditions=conditions
             )
 
         if limit:
-            query = query + sql.SQL(" LIMIT {limit}").format(limit=sql.Placeholder())
-            return db.execute_query(query, [limit])
+            query = query + sql.SQL(" LIMIT {limit}").format(
+                limit=sql.Placeholder("limit")
+            )
+            params["limit"] = limit
 
-        return db.execute_query(query)
+        return db.execute_query(query, params or None)
 
     @staticmethod
-    def update_record(table: str, data: dict, conditions: str):
+    def update_record(
+        table: str, data: dict, conditions: str, key_column: str = None
+    ):
         """Updates records in the specified table"""
         set_items = [
             sql.SQL("{column} = {placeholder}").format(
@@ -56,13 +89,29 @@ class DatabaseOperations:
             conditions=sql.SQL(conditions),
         )
 
-        return db.execute_query(query, data)
+        return DatabaseOperations._write(query, data, table, key_column)
 
     @staticmethod
-    def delete_record(table: str, conditions: str):
+    def delete_record(table: str, conditions: str, key_column: str = None):
         """Deletes records from the specified table"""
         query = sql.SQL("DELETE FROM {table} WHERE {conditions} RETURNING *").format(
             table=sql.Identifier(table), conditions=sql.SQL(conditions)
         )
 
-        return db.execute_query(query)
+        return DatabaseOperations._write(query, None, table, key_column)
+
+    @staticmethod
+    def run_query(query, params=None, invalidates=None, key_column=None):
+        """Runs a custom query and returns its results
+
+        Queries that write must name the table they change in `invalidates`
+        (and the column of the returned rows holding its keys, if any).
+        """
+        if invalidates:
+            return DatabaseOperations._write(query, params, invalidates, key_column)
+        return db.execute_query(query, params)
+
+    @staticmethod
+    def stream_query(query, params=None, batch_size=1000):
+        """Streams the results of a custom query in batches of tuples"""
+        return db.stream_query(query, params, batch_size)
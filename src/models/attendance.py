@@ -1,4 +1,5 @@
 from .base import BaseModel
+from ..database.operations import DatabaseOperations
 
 
 class Attendance(BaseModel):
@@ -13,3 +14,263 @@ class Attendance(BaseModel):
         "created_at",
         "updated_at",
     ]
+
+    @classmethod
+    def getWithInstructor(self, attendance_id):
+        """Retrieves a record along with the instructor owning its classroom"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT a.*, cs.classroom_id, c.instructor_id
+            FROM attendances a
+            JOIN class_sessions cs ON cs.session_id = a.session_id
+            JOIN classrooms c ON c.classroom_id = cs.classroom_id
+            WHERE a.attendance_id = %s
+            """,
+            [attendance_id],
+        )[0]
+
+    @classmethod
+    def getBySession(self, session_id):
+        """Retrieves all records of a session"""
+        return DatabaseOperations.run_query(
+            "SELECT * FROM attendances WHERE session_id = %s ORDER BY student_id",
+            [session_id],
+        )
+
+    @classmethod
+    def upsertMany(self, session_id, classroom_id, records, marked_by):
+        """Creates or updates records for (student_id, status) pairs in one statement.
+
+        Students not enrolled in the classroom are skipped.
+        """
+        records = dict(records)
+        return DatabaseOperations.run_query(
+            """
+            INSERT INTO attendances (session_id, student_id, status, marked_by)
+            SELECT %(session_id)s, r.student_id, r.status, %(marked_by)s
+            FROM unnest(%(student_ids)s::int[], %(statuses)s::varchar[])
+                AS r (student_id, status)
+            JOIN classroom_enrollments ce
+                ON ce.student_id = r.student_id
+                AND ce.classroom_id = %(classroom_id)s
+            ON CONFLICT (session_id, student_id) DO UPDATE
+            SET status = EXCLUDED.status,
+                marked_by = EXCLUDED.marked_by,
+                updated_at = now()
+            RETURNING *
+            """,
+            {
+                "session_id": session_id,
+                "classroom_id": classroom_id,
+                "marked_by": marked_by,
+                "student_ids": list(records.keys()),
+                "statuses": list(records.values()),
+            },
+            invalidates=self.table_name,
+            key_column=self.primary_key,
+        )
+
+    @classmethod
+    def markAbsences(self, session_id, marked_by):
+        """Marks every enrolled student without a record as absent in one statement"""
+        return DatabaseOperations.run_query(
+            """
+            WITH inserted AS (
+                INSERT INTO attendances (session_id, student_id, status, marked_by)
+                SELECT cs.session_id, ce.student_id, 'absent', %(marked_by)s
+                FROM class_sessions cs
+                JOIN classroom_enrollments ce ON ce.classroom_id = cs.classroom_id
+                WHERE cs.session_id = %(session_id)s
+                ON CONFLICT (session_id, student_id) DO NOTHING
+                RETURNING 1
+            )
+            SELECT count(*) AS absent_records_created FROM inserted
+            """,
+            {"session_id": session_id, "marked_by": marked_by},
+            invalidates=self.table_name,
+        )[0]["absent_records_created"]
+
+    @classmethod
+    def getSessionStats(self, session_id, classroom_id):
+        """Aggregates attendance counts for a single session"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT t.*,
+                COALESCE(100.0 * t.present_count / NULLIF(t.total_students, 0), 0)::float
+                    AS attendance_rate
+            FROM (
+                SELECT 1 AS total_sessions,
+                    (SELECT count(*) FROM classroom_enrollments
+                     WHERE classroom_id = %(classroom_id)s) AS total_students,
+                    count(*) FILTER (WHERE status = 'present') AS present_count,
+                    count(*) FILTER (WHERE status = 'absent') AS absent_count
+                FROM attendances
+                WHERE session_id = %(session_id)s
+            ) t
+            """,
+            {"session_id": session_id, "classroom_id": classroom_id},
+        )[0]
+
+    @classmethod
+    def getClassroomStats(self, classroom_id):
+        """Aggregates attendance counts over all sessions of a classroom"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT t.*,
+                COALESCE(
+                    100.0 * t.present_count
+                    / NULLIF(t.total_sessions * t.total_students, 0),
+                    0
+                )::float AS attendance_rate
+            FROM (
+                SELECT
+                    (SELECT count(*) FROM class_sessions
+                     WHERE classroom_id = %(classroom_id)s) AS total_sessions,
+                    (SELECT count(*) FROM classroom_enrollments
+                     WHERE classroom_id = %(classroom_id)s) AS total_students,
+                    count(*) FILTER (WHERE a.status = 'present') AS present_count,
+                    count(*) FILTER (WHERE a.status = 'absent') AS absent_count
+                FROM class_sessions cs
+                JOIN attendances a ON a.session_id = cs.session_id
+                WHERE cs.classroom_id = %(classroom_id)s
+            ) t
+            """,
+            {"classroom_id": classroom_id},
+        )[0]
+
+    @classmethod
+    def getClassroomRecords(self, classroom_id, student_id=None):
+        """Aggregates per-student attendance for the students enrolled in a classroom"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT s.student_id,
+                s.name AS student_name,
+                count(*) FILTER (WHERE a.status = 'present') AS present_count,
+                count(*) FILTER (WHERE a.status = 'absent') AS absent_count,
+                COALESCE(
+                    100.0 * count(*) FILTER (WHERE a.status = 'present')
+                    / NULLIF(count(cs.session_id), 0),
+                    0
+                )::float AS attendance_rate
+            FROM classroom_enrollments ce
+            JOIN students s ON s.student_id = ce.student_id
+            LEFT JOIN class_sessions cs ON cs.classroom_id = ce.classroom_id
+            LEFT JOIN attendances a
+                ON a.session_id = cs.session_id AND a.student_id = ce.student_id
+            WHERE ce.classroom_id = %(classroom_id)s
+                AND (%(student_id)s::int IS NULL OR ce.student_id = %(student_id)s)
+            GROUP BY s.student_id, s.name
+            ORDER BY s.name
+            """,
+            {"classroom_id": classroom_id, "student_id": student_id},
+        )
+
+    @classmethod
+    def streamClassroomExport(
+        self, classroom_id, start_date=None, end_date=None, status=None
+    ):
+        """Streams a classroom's attendance rows for export, oldest session first"""
+        return DatabaseOperations.stream_query(
+            """
+            SELECT cs.session_date, cs.start_time, cs.end_time,
+                s.student_number, s.name, a.status, a.marked_by, a.updated_at
+            FROM class_sessions cs
+            JOIN attendances a ON a.session_id = cs.session_id
+            JOIN students s ON s.student_id = a.student_id
+            WHERE cs.classroom_id = %(classroom_id)s
+                AND (%(start_date)s::date IS NULL OR cs.session_date >= %(start_date)s)
+                AND (%(end_date)s::date IS NULL OR cs.session_date <= %(end_date)s)
+                AND (%(status)s::varchar IS NULL OR a.status = %(status)s)
+            ORDER BY cs.session_date, cs.start_time, s.name
+            """,
+            {
+                "classroom_id": classroom_id,
+                "start_date": start_date,
+                "end_date": end_date,
+                "status": status,
+            },
+        )
+
+    @classmethod
+    def getClassroomMatrix(self, classroom_id, start_date=None, end_date=None):
+        """Builds a classroom's students x sessions status matrix in one query"""
+        return DatabaseOperations.run_query(
+            """
+            WITH roster AS (
+                SELECT s.student_id, s.name
+                FROM classroom_enrollments ce
+                JOIN students s ON s.student_id = ce.student_id
+                WHERE ce.classroom_id = %(classroom_id)s
+            ),
+            sessions AS (
+                SELECT session_id, session_date, start_time
+                FROM class_sessions
+                WHERE classroom_id = %(classroom_id)s
+                    AND (%(start_date)s::date IS NULL OR session_date >= %(start_date)s)
+                    AND (%(end_date)s::date IS NULL OR session_date <= %(end_date)s)
+            )
+            SELECT %(classroom_id)s AS classroom_id,
+                COALESCE(
+                    (SELECT array_agg(student_id ORDER BY name, student_id) FROM roster),
+                    '{}'
+                ) AS student_ids,
+                COALESCE(
+                    (SELECT array_agg(name ORDER BY name, student_id) FROM roster),
+                    '{}'
+                ) AS student_names,
+                COALESCE(
+                    (
+                        SELECT array_agg(session_id ORDER BY session_date, start_time, session_id)
+                        FROM sessions
+                    ),
+                    '{}'
+                ) AS session_ids,
+                COALESCE(
+                    (
+                        SELECT array_agg(session_date ORDER BY session_date, start_time, session_id)
+                        FROM sessions
+                    ),
+                    '{}'
+                ) AS session_dates,
+                COALESCE(
+                    (
+                        SELECT string_agg(
+                            CASE a.status
+                                WHEN 'present' THEN '1'
+                                WHEN 'absent' THEN '2'
+                                ELSE '0'
+                            END,
+                            ''
+                            ORDER BY r.name, r.student_id,
+                                se.session_date, se.start_time, se.session_id
+                        )
+                        FROM roster r
+                        CROSS JOIN sessions se
+                        LEFT JOIN attendances a
+                            ON a.session_id = se.session_id
+                            AND a.student_id = r.student_id
+                    ),
+                    ''
+                ) AS statuses
+            """,
+            {
+                "classroom_id": classroom_id,
+                "start_date": start_date,
+                "end_date": end_date,
+            },
+        )[0]
+
+    @classmethod
+    def getChangedSince(self, classroom_id, since=None):
+        """Retrieves a classroom's records created or updated after a timestamp"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT a.*
+            FROM class_sessions cs
+            JOIN attendances a ON a.session_id = cs.session_id
+            WHERE cs.classroom_id = %(classroom_id)s
+                AND (%(since)s::timestamp IS NULL OR a.updated_at > %(since)s)
+            ORDER BY a.updated_at, a.attendance_id
+            """,
+            {"classroom_id": classroom_id, "since": since},
+        )
@@ -1,3 +1,5 @@
+from psycopg2 import sql
+
 from ..database.operations import DatabaseOperations
 
 
@@ -9,7 +11,9 @@ class BaseModel:
     @classmethod
     def create(self, **kwargs):
         """Creates a new record"""
-        return DatabaseOperations.create_record(self.table_name, kwargs)
+        return DatabaseOperations.create_record(
+            self.table_name, kwargs, key_column=self.primary_key
+        )
 
     @classmethod
     def getById(self, id):
@@ -19,20 +23,75 @@ class BaseModel:
         )[0]
 
     @classmethod
-    def getAll(self):
-        """Retrieves all records"""
-        return DatabaseOperations.read_records(self.table_name)
+    def getAll(self, columns="*", **filters):
+        """Retrieves all records, optionally projected and filtered by equality.
+
+        Filters whose value is None are ignored.
+        """
+        filters = {k: v for k, v in filters.items() if v is not None}
+        conditions = sql.SQL(" AND ").join(
+            sql.SQL("{} = {}").format(sql.Identifier(k), sql.Placeholder(k))
+            for k in filters
+        )
+        return DatabaseOperations.read_records(
+            self.table_name,
+            columns=columns,
+            conditions=conditions if filters else None,
+            params=filters,
+        )
 
     @classmethod
     def update(self, id, **kwargs):
         """Updates an existing record"""
         return DatabaseOperations.update_record(
-            self.table_name, kwargs, f"{self.primary_key} = {id}"
+            self.table_name,
+            kwargs,
+            f"{self.primary_key} = {id}",
+            key_column=self.primary_key,
         )
 
     @classmethod
     def delete(self, id):
         """Deletes a record"""
         return DatabaseOperations.delete_record(
-            self.table_name, f"{self.primary_key} = {id}"
+            self.table_name, f"{self.primary_key} = {id}", key_column=self.primary_key
         )
+
+    @classmethod
+    def getDeletedSince(self, since, scope_id=None):
+        """Retrieves ids of records deleted after a timestamp"""
+        rows = DatabaseOperations.run_query(
+            """
+            SELECT record_id
+            FROM deleted_records
+            WHERE table_name = %(table_name)s
+                AND deleted_at > %(since)s
+                AND (%(scope_id)s::int IS NULL OR scope_id = %(scope_id)s)
+            ORDER BY deleted_at
+            """,
+            {"table_name": self.table_name, "since": since, "scope_id": scope_id},
+        )
+        return [row["record_id"] for row in rows]
+
+    @classmethod
+    def getSyncWatermark(self):
+        """Timestamp up to which changes are guaranteed to be visible.
+
+        Transactions still in flight stamp updated_at with their start time,
+        so the watermark stops just before the oldest one: rows it commits
+        later are stamped after the watermark and still match the next
+        `> since` query. Clients may see a few rows twice, but never miss one.
+        """
+        return DatabaseOperations.run_query(
+            """
+            SELECT LEAST(
+                LOCALTIMESTAMP,
+                (
+                    SELECT min(xact_start)::timestamp
+                    FROM pg_stat_activity
+                    WHERE datname = current_database()
+                        AND pid <> pg_backend_pid()
+                )
+            ) - interval '1 microsecond' AS until
+            """
+        )[0]["until"]
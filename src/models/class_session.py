@@ -1,4 +1,5 @@
 from .base import BaseModel
+from ..database.operations import DatabaseOperations
 
 
 class ClassSession(BaseModel):
@@ -13,3 +14,39 @@ class ClassSession(BaseModel):
         "created_at",
         "updated_at",
     ]
+
+    @classmethod
+    def getWithInstructor(self, session_id):
+        """Retrieves a session along with the instructor owning its classroom"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT cs.*, c.instructor_id
+            FROM class_sessions cs
+            JOIN classrooms c ON c.classroom_id = cs.classroom_id
+            WHERE cs.session_id = %s
+            """,
+            [session_id],
+        )[0]
+
+    @classmethod
+    def getAttendanceVersion(self, session_id, classroom_id):
+        """Cheap version stamp of a session's attendance and its classroom roster"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT concat_ws(':',
+                (SELECT updated_at FROM class_sessions WHERE session_id = %(session_id)s),
+                a.updated_at, a.total, e.updated_at, e.total
+            ) AS version
+            FROM (
+                SELECT max(updated_at) AS updated_at, count(*) AS total
+                FROM attendances
+                WHERE session_id = %(session_id)s
+            ) a,
+            (
+                SELECT max(updated_at) AS updated_at, count(*) AS total
+                FROM classroom_enrollments
+                WHERE classroom_id = %(classroom_id)s
+            ) e
+            """,
+            {"session_id": session_id, "classroom_id": classroom_id},
+        )[0]["version"]
@@ -1,4 +1,5 @@
 from .base import BaseModel
+from ..database.operations import DatabaseOperations
 
 
 class Classroom(BaseModel):
@@ -14,3 +15,274 @@ class Classroom(BaseModel):
         "created_at",
         "updated_at",
     ]
+
+    @classmethod
+    def getVersion(self, classroom_id):
+        """Cheap version stamp of a classroom and everything scoped to it"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT concat_ws(':',
+                (SELECT updated_at FROM classrooms WHERE classroom_id = %(classroom_id)s),
+                e.updated_at, e.total, st.updated_at,
+                se.updated_at, se.total, a.updated_at, a.total
+            ) AS version
+            FROM (
+                SELECT max(updated_at) AS updated_at, count(*) AS total
+                FROM classroom_enrollments
+                WHERE classroom_id = %(classroom_id)s
+            ) e,
+            (
+                SELECT max(s.updated_at) AS updated_at
+                FROM classroom_enrollments ce
+                JOIN students s ON s.student_id = ce.student_id
+                WHERE ce.classroom_id = %(classroom_id)s
+            ) st,
+            (
+                SELECT max(updated_at) AS updated_at, count(*) AS total
+                FROM class_sessions
+                WHERE classroom_id = %(classroom_id)s
+            ) se,
+            (
+                SELECT max(a.updated_at) AS updated_at, count(*) AS total
+                FROM class_sessions cs
+                JOIN attendances a ON a.session_id = cs.session_id
+                WHERE cs.classroom_id = %(classroom_id)s
+            ) a
+            """,
+            {"classroom_id": classroom_id},
+        )[0]["version"]
+
+    @classmethod
+    def getListVersion(self, instructor_id=None, include_related=False):
+        """Cheap version stamp of the classrooms visible to an instructor (or all).
+
+        With include_related, enrollments, sessions and attendances of those
+        classrooms are stamped as well, as the dashboard aggregates them.
+        """
+        return DatabaseOperations.run_query(
+            """
+            WITH scope AS (
+                SELECT classroom_id, updated_at
+                FROM classrooms
+                WHERE %(instructor_id)s::int IS NULL OR instructor_id = %(instructor_id)s
+            )
+            SELECT concat_ws(':',
+                (SELECT max(updated_at) FROM scope),
+                (SELECT count(*) FROM scope),
+                CASE WHEN %(include_related)s THEN concat_ws(':',
+                    (
+                        SELECT concat_ws(':', max(ce.updated_at), count(*))
+                        FROM scope JOIN classroom_enrollments ce USING (classroom_id)
+                    ),
+                    (
+                        SELECT concat_ws(':', max(cs.updated_at), count(*))
+                        FROM scope JOIN class_sessions cs USING (classroom_id)
+                    ),
+                    (
+                        SELECT concat_ws(':', max(a.updated_at), count(*))
+                        FROM scope
+                        JOIN class_sessions cs USING (classroom_id)
+                        JOIN attendances a ON a.session_id = cs.session_id
+                    ),
+                    -- "Next" and "latest" sessions move with the clock
+                    date_trunc('minute', LOCALTIMESTAMP)
+                ) END
+            ) AS version
+            """,
+            {"instructor_id": instructor_id, "include_related": include_related},
+        )[0]["version"]
+
+    @classmethod
+    def getDashboard(self, instructor_id=None, is_active=None):
+        """Retrieves classrooms with enrollment counts, next session and latest attendance rate"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT c.*,
+                sc.student_count,
+                ns.session_id AS next_session_id,
+                ns.session_date AS next_session_date,
+                ns.start_time AS next_session_start_time,
+                ns.end_time AS next_session_end_time,
+                ls.session_id AS latest_session_id,
+                CASE WHEN ls.session_id IS NOT NULL THEN
+                    COALESCE(100.0 * ls.present_count / NULLIF(sc.student_count, 0), 0)::float
+                END AS latest_attendance_rate
+            FROM classrooms c
+            CROSS JOIN LATERAL (
+                SELECT count(*) AS student_count
+                FROM classroom_enrollments ce
+                WHERE ce.classroom_id = c.classroom_id
+            ) sc
+            LEFT JOIN LATERAL (
+                SELECT cs.session_id, cs.session_date, cs.start_time, cs.end_time
+                FROM class_sessions cs
+                WHERE cs.classroom_id = c.classroom_id
+                    AND (cs.session_date, cs.end_time) >= (CURRENT_DATE, LOCALTIME)
+                ORDER BY cs.session_date, cs.start_time
+                LIMIT 1
+            ) ns ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT cs.session_id,
+                    (SELECT count(*) FROM attendances a
+                     WHERE a.session_id = cs.session_id AND a.status = 'present')
+                        AS present_count
+                FROM class_sessions cs
+                WHERE cs.classroom_id = c.classroom_id
+                    AND (cs.session_date, cs.start_time) <= (CURRENT_DATE, LOCALTIME)
+                ORDER BY cs.session_date DESC, cs.start_time DESC
+                LIMIT 1
+            ) ls ON TRUE
+            WHERE (%(instructor_id)s::int IS NULL OR c.instructor_id = %(instructor_id)s)
+                AND (%(is_active)s::boolean IS NULL OR c.is_active = %(is_active)s)
+            ORDER BY c.year DESC, c.semester, c.name
+            """,
+            {"instructor_id": instructor_id, "is_active": is_active},
+        )
+
+    @classmethod
+    def getDetail(
+        self,
+        classroom_id,
+        q=None,
+        month_start=None,
+        month_end=None,
+        status=None,
+        limit=50,
+        offset=0,
+    ):
+        """Retrieves classroom totals and one filtered page of per-student attendance"""
+        pattern = None
+        if q:
+            pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+        return DatabaseOperations.run_query(
+            """
+            WITH sessions AS (
+                SELECT session_id, session_date
+                FROM class_sessions
+                WHERE classroom_id = %(classroom_id)s
+                    AND (%(month_start)s::date IS NULL OR session_date >= %(month_start)s)
+                    AND (%(month_end)s::date IS NULL OR session_date < %(month_end)s)
+            ),
+            roster AS (
+                SELECT s.student_id, s.name, s.student_number, s.department
+                FROM classroom_enrollments ce
+                JOIN students s ON s.student_id = ce.student_id
+                WHERE ce.classroom_id = %(classroom_id)s
+            ),
+            records AS (
+                SELECT a.attendance_id, a.session_id, se.session_date,
+                    a.student_id, a.status, a.marked_by
+                FROM sessions se
+                JOIN attendances a ON a.session_id = se.session_id
+            ),
+            totals AS (
+                SELECT (SELECT count(*) FROM sessions) AS total_sessions,
+                    (SELECT count(*) FROM roster) AS total_students,
+                    count(*) FILTER (WHERE status = 'present') AS present_count,
+                    count(*) FILTER (WHERE status = 'absent') AS absent_count
+                FROM records
+            ),
+            matches AS (
+                SELECT r.*
+                FROM roster r
+                WHERE (
+                        %(pattern)s::text IS NULL
+                        OR r.name ILIKE '%%' || %(pattern)s || '%%'
+                        OR r.student_number::text LIKE %(pattern)s || '%%'
+                    )
+                    AND (
+                        %(status)s::varchar IS NULL
+                        OR EXISTS (
+                            SELECT 1 FROM records rc
+                            WHERE rc.student_id = r.student_id
+                                AND rc.status = %(status)s
+                        )
+                    )
+            ),
+            page AS (
+                SELECT * FROM matches
+                ORDER BY name, student_id
+                LIMIT %(limit)s OFFSET %(offset)s
+            ),
+            page_students AS (
+                SELECT p.student_id, p.name, p.student_number, p.department,
+                    count(rc.attendance_id) FILTER (WHERE rc.status = 'present')
+                        AS present_count,
+                    count(rc.attendance_id) FILTER (WHERE rc.status = 'absent')
+                        AS absent_count,
+                    COALESCE(
+                        json_agg(
+                            json_build_object(
+                                'attendance_id', rc.attendance_id,
+                                'session_id', rc.session_id,
+                                'session_date', rc.session_date,
+                                'status', rc.status,
+                                'marked_by', rc.marked_by
+                            )
+                            ORDER BY rc.session_date, rc.session_id
+                        ) FILTER (
+                            WHERE rc.attendance_id IS NOT NULL
+                                AND (%(status)s::varchar IS NULL OR rc.status = %(status)s)
+                        ),
+                        '[]'
+                    ) AS records
+                FROM page p
+                LEFT JOIN records rc ON rc.student_id = p.student_id
+                GROUP BY p.student_id, p.name, p.student_number, p.department
+            )
+            SELECT %(classroom_id)s AS classroom_id,
+                t.*,
+                COALESCE(
+                    100.0 * t.present_count
+                    / NULLIF(t.total_sessions * t.total_students, 0),
+                    0
+                )::float AS attendance_rate,
+                (SELECT count(*) FROM matches) AS total_matches,
+                COALESCE(
+                    (
+                        SELECT json_agg(
+                            json_build_object(
+                                'student_id', ps.student_id,
+                                'name', ps.name,
+                                'student_number', ps.student_number,
+                                'department', ps.department,
+                                'present_count', ps.present_count,
+                                'absent_count', ps.absent_count,
+                                'attendance_rate', COALESCE(
+                                    100.0 * ps.present_count / NULLIF(t.total_sessions, 0),
+                                    0
+                                )::float,
+                                'records', ps.records
+                            )
+                            ORDER BY ps.name, ps.student_id
+                        )
+                        FROM page_students ps
+                    ),
+                    '[]'
+                ) AS students
+            FROM totals t
+            """,
+            {
+                "classroom_id": classroom_id,
+                "month_start": month_start,
+                "month_end": month_end,
+                "pattern": pattern,
+                "status": status,
+                "limit": limit,
+                "offset": offset,
+            },
+        )[0]
+
+    @classmethod
+    def getChangedSince(self, since=None, instructor_id=None):
+        """Retrieves classrooms created or updated after a timestamp"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT * FROM classrooms
+            WHERE (%(since)s::timestamp IS NULL OR updated_at > %(since)s)
+                AND (%(instructor_id)s::int IS NULL OR instructor_id = %(instructor_id)s)
+            ORDER BY updated_at, classroom_id
+            """,
+            {"since": since, "instructor_id": instructor_id},
+        )
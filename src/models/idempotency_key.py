@@ -0,0 +1,103 @@
+from .base import BaseModel
+from ..database.operations import DatabaseOperations
+
+
+class IdempotencyKey(BaseModel):
+    table_name = "idempotency_keys"
+    primary_key = "idempotency_key"
+    fields = [
+        "scope",
+        "idempotency_key",
+        "request_hash",
+        "status_code",
+        "response_body",
+        "created_at",
+        "expires_at",
+    ]
+
+    @classmethod
+    def claim(self, scope, key, request_hash, lock_seconds):
+        """Claims a key for processing; returns None if someone else holds it.
+
+        Expired entries, including claims abandoned by a crashed worker once
+        their lock runs out, are taken over.
+        """
+        rows = DatabaseOperations.run_query(
+            """
+            INSERT INTO idempotency_keys
+                (scope, idempotency_key, request_hash, expires_at)
+            VALUES (
+                %(scope)s, %(key)s, %(request_hash)s,
+                now() + %(lock_seconds)s * interval '1 second'
+            )
+            ON CONFLICT (scope, idempotency_key) DO UPDATE
+            SET request_hash = EXCLUDED.request_hash,
+                status_code = NULL,
+                response_body = NULL,
+                created_at = now(),
+                expires_at = EXCLUDED.expires_at
+            WHERE idempotency_keys.expires_at < now()
+            RETURNING scope
+            """,
+            {
+                "scope": scope,
+                "key": key,
+                "request_hash": request_hash,
+                "lock_seconds": lock_seconds,
+            },
+            invalidates=self.table_name,
+        )
+        return rows[0] if rows else None
+
+    @classmethod
+    def get(self, scope, key):
+        """Retrieves a live entry"""
+        rows = DatabaseOperations.run_query(
+            """
+            SELECT * FROM idempotency_keys
+            WHERE scope = %s AND idempotency_key = %s AND expires_at >= now()
+            """,
+            [scope, key],
+        )
+        return rows[0] if rows else None
+
+    @classmethod
+    def complete(self, scope, key, status_code, response_body, ttl_seconds):
+        """Stores the response of a claimed key for replay"""
+        DatabaseOperations.run_query(
+            """
+            UPDATE idempotency_keys
+            SET status_code = %(status_code)s,
+                response_body = %(response_body)s,
+                expires_at = now() + %(ttl_seconds)s * interval '1 second'
+            WHERE scope = %(scope)s AND idempotency_key = %(key)s
+            """,
+            {
+                "scope": scope,
+                "key": key,
+                "status_code": status_code,
+                "response_body": response_body,
+                "ttl_seconds": ttl_seconds,
+            },
+            invalidates=self.table_name,
+        )
+
+    @classmethod
+    def release(self, scope, key):
+        """Drops a claim whose request failed so that a retry runs again"""
+        DatabaseOperations.run_query(
+            """
+            DELETE FROM idempotency_keys
+            WHERE scope = %s AND idempotency_key = %s AND status_code IS NULL
+            """,
+            [scope, key],
+            invalidates=self.table_name,
+        )
+
+    @classmethod
+    def purgeExpired(self):
+        """Deletes expired entries"""
+        DatabaseOperations.run_query(
+            "DELETE FROM idempotency_keys WHERE expires_at < now()",
+            invalidates=self.table_name,
+        )
@@ -1,4 +1,7 @@
+from psycopg2 import sql
+
 from .base import BaseModel
+from ..database.operations import DatabaseOperations
 
 
 class Student(BaseModel):
@@ -14,3 +17,51 @@ class Student(BaseModel):
         "created_at",
         "updated_at",
     ]
+
+    @classmethod
+    def getFaceTemplatesByClassroom(self, classroom_id):
+        """Retrieves face templates of the students enrolled in a classroom"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT s.student_id, s.name, s.face_template
+            FROM classroom_enrollments ce
+            JOIN students s ON s.student_id = ce.student_id
+            WHERE ce.classroom_id = %s AND s.face_template IS NOT NULL
+            """,
+            [classroom_id],
+        )
+
+    @classmethod
+    def getChangedSince(self, since=None):
+        """Retrieves students created or updated after a timestamp"""
+        return DatabaseOperations.run_query(
+            """
+            SELECT * FROM students
+            WHERE %(since)s::timestamp IS NULL OR updated_at > %(since)s
+            ORDER BY updated_at, student_id
+            """,
+            {"since": since},
+        )
+
+    @classmethod
+    def getByClassroom(self, classroom_id, columns=None):
+        """Retrieves the students enrolled in a classroom, optionally projected"""
+        if columns:
+            columns = sql.SQL(", ").join(
+                sql.SQL("s.{}").format(sql.Identifier(c)) for c in columns
+            )
+        else:
+            columns = sql.SQL("s.*")
+
+        return DatabaseOperations.run_query(
+            sql.SQL(
+                """
+                SELECT {columns}
+                FROM classroom_enrollments ce
+                JOIN students s ON s.student_id = ce.student_id
+                WHERE ce.classroom_id = %s
+                ORDER BY ce.enrollment_id
+                """
+            ).format(columns=columns),
+            [classroom_id],
+        )
@@ -129,6 +129,16 @@ class ClassroomResponse(ClassroomBase):
     updated_at: datetime
 
 
+class ClassroomDashboardCard(ClassroomResponse):
+    student_count: int
+    next_session_id: Optional[int] = None
+    next_session_date: Optional[date] = None
+    next_session_start_time: Optional[time] = None
+    next_session_end_time: Optional[time] = None
+    latest_session_id: Optional[int] = None
+    latest_attendance_rate: Optional[float] = None
+
+
 # Classroom Enrollment Schemas
 class EnrollmentCreate(BaseModel):
     classroom_id: int
@@ -193,6 +203,15 @@ class AttendanceResponse(AttendanceBase):
     updated_at: datetime
 
 
+class StudentStatusUpdate(BaseModel):
+    student_id: int
+    status: AttendanceStatusEnum
+
+
+class BulkAttendanceUpdate(BaseModel):
+    records: List[StudentStatusUpdate]
+
+
 # Face Recognition Schemas
 class FaceDetectionResult(BaseModel):
     student_id: int
@@ -225,3 +244,58 @@ class StudentAttendanceRecord(BaseModel):
     present_count: int
     absent_count: int
     attendance_rate: float
+
+
+class StudentSessionAttendance(BaseModel):
+    attendance_id: int
+    session_id: int
+    session_date: date
+    status: AttendanceStatusEnum
+    marked_by: MarkedByEnum
+
+
+class ClassroomDetailStudent(BaseModel):
+    student_id: int
+    name: str
+    student_number: int
+    department: Optional[str] = None
+    present_count: int
+    absent_count: int
+    attendance_rate: float
+    records: List[StudentSessionAttendance]
+
+
+class ClassroomDetail(AttendanceStats):
+    classroom_id: int
+    total_matches: int
+    students: List[ClassroomDetailStudent]
+
+
+class AttendanceMatrix(BaseModel):
+    classroom_id: int
+    student_ids: List[int]
+    student_names: List[str]
+    session_ids: List[int]
+    session_dates: List[date]
+    # One character per (student, session), row-major by student:
+    # "0" no record, "1" present, "2" absent
+    statuses: str
+
+
+# Delta Sync Schemas
+class ChangesBase(BaseModel):
+    since: Optional[datetime] = None
+    until: datetime  # pass back as `since` on the next sync
+    deleted: List[int]
+
+
+class StudentChanges(ChangesBase):
+    changed: List[StudentResponse]
+
+
+class ClassroomChanges(ChangesBase):
+    changed: List[ClassroomResponse]
+
+
+class AttendanceChanges(ChangesBase):
+    changed: List[AttendanceResponse]
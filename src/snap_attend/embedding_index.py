@@ -0,0 +1,326 @@
+"""
+Embedding indexes for campus-wide face search.
+
+Both indexes store float32 vectors with precomputed squared norms and
+answer k-nearest-neighbour queries by Euclidean distance:
+
+- ExactIndex scores every stored vector with one matrix product.
+- IVFIndex clusters vectors with k-means and only scores the `nprobe`
+  clusters closest to each query, trading a little recall for speed.
+
+Indexes serialize to bytes (an .npz archive) so the caller decides how to
+protect them at rest.
+"""
+import io
+import logging
+
+import numpy as np
+
+
+def squared_distances(queries, vectors, vector_sq_norms):
+    """Squared Euclidean distances between queries and vectors as ||a||^2 + ||b||^2 - 2ab."""
+    distances = queries @ vectors.T
+    distances *= -2.0
+    distances += np.einsum("ij,ij->i", queries, queries)[:, None]
+    distances += vector_sq_norms[None, :]
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+
+def merge_top_k(best_distances, best_ids, distances, ids, k):
+    """Merge new candidates into the running top-k of each query."""
+    distances = np.concatenate([best_distances, distances], axis=1)
+    ids = np.concatenate([best_ids, ids], axis=1)
+    if distances.shape[1] > k:
+        keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, keep, axis=1)
+        ids = np.take_along_axis(ids, keep, axis=1)
+    return distances, ids
+
+
+class EmbeddingIndex:
+    """Common bookkeeping: ids, names and the version stamp of the source data."""
+
+    kind = None
+
+    def __init__(self, dim=128):
+        """Initialize an empty index."""
+        self.logger = logging.getLogger("face_attendance")
+        self.dim = dim
+        self.names = {}  # student_id -> name
+        self.stamp = None  # set by the owner to detect stale persisted indexes
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, student_id):
+        return int(student_id) in self.names
+
+    def add(self, student_ids, names, vectors):
+        """Add (or replace) vectors for the given students."""
+        student_ids = np.asarray(student_ids, dtype=np.int64).reshape(-1)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not len(student_ids):
+            return
+
+        self.remove([i for i in student_ids if int(i) in self.names])
+        self._add(student_ids, vectors)
+        for student_id, name in zip(student_ids, names):
+            self.names[int(student_id)] = name
+
+    def remove(self, student_ids):
+        """Remove the vectors of the given students."""
+        student_ids = np.asarray(list(student_ids), dtype=np.int64)
+        student_ids = student_ids[np.isin(student_ids, list(self.names))] if len(self.names) else student_ids[:0]
+        if not len(student_ids):
+            return
+
+        self._remove(student_ids)
+        for student_id in student_ids:
+            del self.names[int(student_id)]
+
+    def search(self, queries, k=5):
+        """Return (distances, student_ids) of the k nearest vectors per query.
+
+        Both arrays have shape (len(queries), k), sorted by distance; missing
+        neighbours have distance inf and id -1.
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), 0), -1, dtype=np.int64)
+
+        if len(self) and len(queries):
+            best_distances, best_ids = self._search(queries, k, best_distances, best_ids)
+
+        # Pad to k and sort each row
+        if best_distances.shape[1] < k:
+            pad = k - best_distances.shape[1]
+            best_distances = np.pad(best_distances, ((0, 0), (0, pad)), constant_values=np.inf)
+            best_ids = np.pad(best_ids, ((0, 0), (0, pad)), constant_values=-1)
+        order = np.argsort(best_distances, axis=1)
+        best_distances = np.sqrt(np.take_along_axis(best_distances, order, axis=1))
+        return best_distances, np.take_along_axis(best_ids, order, axis=1)
+
+    def to_bytes(self):
+        """Serialize the index."""
+        buffer = io.BytesIO()
+        ids = np.fromiter(self.names, dtype=np.int64, count=len(self.names))
+        np.savez(
+            buffer,
+            kind=np.array(self.kind),
+            dim=np.array(self.dim),
+            stamp=np.array("" if self.stamp is None else self.stamp),
+            name_ids=ids,
+            names=np.array([self.names[i] for i in ids.tolist()], dtype=str),
+            **self._arrays()
+        )
+        return buffer.getvalue()
+
+    @staticmethod
+    def from_bytes(data, **options):
+        """Deserialize an index written by to_bytes."""
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+
+        kind = str(arrays.pop("kind"))
+        index_class = {cls.kind: cls for cls in (ExactIndex, IVFIndex)}[kind]
+        index = index_class(dim=int(arrays.pop("dim")), **options)
+        stamp = str(arrays.pop("stamp"))
+        index.stamp = stamp or None
+        index.names = dict(zip(arrays.pop("name_ids").tolist(), arrays.pop("names").tolist()))
+        index._load_arrays(arrays)
+        return index
+
+
+class ExactIndex(EmbeddingIndex):
+    """Brute-force index; every search scores all vectors in one matrix product."""
+
+    kind = "exact"
+
+    def __init__(self, dim=128, **options):
+        """Initialize an empty index."""
+        super().__init__(dim)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+
+    def _add(self, student_ids, vectors):
+        self.ids = np.concatenate([self.ids, student_ids])
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.sq_norms = np.concatenate([self.sq_norms, np.einsum("ij,ij->i", vectors, vectors)])
+
+    def _remove(self, student_ids):
+        keep = ~np.isin(self.ids, student_ids)
+        self.ids = self.ids[keep]
+        self.vectors = self.vectors[keep]
+        self.sq_norms = self.sq_norms[keep]
+
+    def _search(self, queries, k, best_distances, best_ids, chunk_size=8192):
+        # Score in chunks so the distance matrix stays small for large indexes
+        for start in range(0, len(self.ids), chunk_size):
+            stop = start + chunk_size
+            distances = squared_distances(queries, self.vectors[start:stop], self.sq_norms[start:stop])
+            ids = np.broadcast_to(self.ids[start:stop], distances.shape)
+            best_distances, best_ids = merge_top_k(best_distances, best_ids, distances, ids, k)
+        return best_distances, best_ids
+
+    def _arrays(self):
+        return {"ids": self.ids, "vectors": self.vectors}
+
+    def _load_arrays(self, arrays):
+        self.ids = arrays["ids"]
+        self.vectors = np.ascontiguousarray(arrays["vectors"], dtype=np.float32)
+        self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+
+class IVFIndex(EmbeddingIndex):
+    """Inverted-file index: k-means clusters, search probes the nearest few.
+
+    Clusters are trained on the first vectors added and retrained when the
+    index grows past `retrain_factor` times the size it was trained on.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim=128, nlist=None, nprobe=8, retrain_factor=4, seed=0, **options):
+        """Initialize an empty, untrained index."""
+        super().__init__(dim)
+        self.nlist = nlist  # None: about 4 * sqrt(n) clusters
+        self.nprobe = nprobe
+        self.retrain_factor = retrain_factor
+        self.seed = seed
+        self.trained_size = 0
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.centroid_sq_norms = np.empty(0, dtype=np.float32)
+        self.lists = []  # per cluster: (ids, vectors, sq_norms)
+
+    def train(self, vectors, iterations=10, sample_per_list=64):
+        """Fit cluster centroids with k-means on a sample of vectors."""
+        n = len(vectors)
+        nlist = self.nlist or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * sample_per_list)
+        sample = vectors[rng.choice(n, sample_size, replace=False)] if sample_size < n else vectors
+        sample_sq_norms = np.einsum("ij,ij->i", sample, sample)
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            centroid_sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+            assignment = np.argmin(
+                squared_distances(sample, centroids, centroid_sq_norms), axis=1
+            )
+            counts = np.bincount(assignment, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            # Keep the old centroid for clusters that lost all their points
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+        self.centroids = centroids.astype(np.float32)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.trained_size = n
+        self.logger.info(f"Trained IVF index with {nlist} clusters on {n} vectors")
+
+    def _assign(self, vectors):
+        return np.argmin(squared_distances(vectors, self.centroids, self.centroid_sq_norms), axis=1)
+
+    def _add(self, student_ids, vectors):
+        if self.trained_size == 0 or len(self.names) + len(student_ids) > self.retrain_factor * self.trained_size:
+            # (Re)train on everything and rebuild the lists
+            all_ids, all_vectors = self._all()
+            all_ids = np.concatenate([all_ids, student_ids])
+            all_vectors = np.concatenate([all_vectors, vectors])
+            self.train(all_vectors)
+            self.lists = [
+                (np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32), np.empty(0, dtype=np.float32))
+                for _ in range(len(self.centroids))
+            ]
+            student_ids, vectors = all_ids, all_vectors
+
+        assignment = self._assign(vectors)
+        sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+        for list_id in np.unique(assignment):
+            members = assignment == list_id
+            ids, list_vectors, list_sq_norms = self.lists[list_id]
+            self.lists[list_id] = (
+                np.concatenate([ids, student_ids[members]]),
+                np.concatenate([list_vectors, vectors[members]]),
+                np.concatenate([list_sq_norms, sq_norms[members]]),
+            )
+
+    def _remove(self, student_ids):
+        for list_id, (ids, vectors, sq_norms) in enumerate(self.lists):
+            keep = ~np.isin(ids, student_ids)
+            if not keep.all():
+                self.lists[list_id] = (ids[keep], vectors[keep], sq_norms[keep])
+
+    def _search(self, queries, k, best_distances, best_ids):
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_distances = squared_distances(queries, self.centroids, self.centroid_sq_norms)
+        probes = np.argpartition(centroid_distances, nprobe - 1, axis=1)[:, :nprobe]
+
+        best_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+
+        # Score each probed list once against all the queries probing it
+        for list_id in np.unique(probes):
+            ids, vectors, sq_norms = self.lists[list_id]
+            if not len(ids):
+                continue
+            query_rows = np.nonzero((probes == list_id).any(axis=1))[0]
+            distances = squared_distances(queries[query_rows], vectors, sq_norms)
+            merged = merge_top_k(
+                best_distances[query_rows],
+                best_ids[query_rows],
+                distances,
+                np.broadcast_to(ids, distances.shape),
+                k,
+            )
+            best_distances[query_rows], best_ids[query_rows] = merged
+        return best_distances, best_ids
+
+    def _all(self):
+        if not self.lists:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32)
+        return (
+            np.concatenate([ids for ids, _, _ in self.lists]),
+            np.concatenate([vectors for _, vectors, _ in self.lists]),
+        )
+
+    def _arrays(self):
+        ids, vectors = self._all()
+        list_sizes = np.array([len(list_ids) for list_ids, _, _ in self.lists], dtype=np.int64)
+        return {
+            "ids": ids,
+            "vectors": vectors,
+            "centroids": self.centroids,
+            "list_sizes": list_sizes,
+            "trained_size": np.array(self.trained_size),
+        }
+
+    def _load_arrays(self, arrays):
+        self.centroids = np.ascontiguousarray(arrays["centroids"], dtype=np.float32)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.trained_size = int(arrays["trained_size"])
+
+        ids = arrays["ids"]
+        vectors = np.ascontiguousarray(arrays["vectors"], dtype=np.float32)
+        bounds = np.concatenate([[0], np.cumsum(arrays["list_sizes"])])
+        self.lists = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            list_vectors = vectors[start:stop]
+            self.lists.append((ids[start:stop], list_vectors, np.einsum("ij,ij->i", list_vectors, list_vectors)))
+
+
+def create_index(config, size_hint=0):
+    """Create an empty index as configured ("exact", "ivf" or "auto" by size)."""
+    index_config = config.get("embedding_index", {})
+    kind = index_config.get("type", "auto")
+    if kind == "auto":
+        kind = "ivf" if size_hint >= index_config.get("ivf_threshold", 20000) else "exact"
+
+    if kind == "ivf":
+        return IVFIndex(nlist=index_config.get("nlist"), nprobe=index_config.get("nprobe", 8))
+    return ExactIndex()
@@ -2,18 +2,27 @@
 Face Attendance System - Refactored Implementation
 """
 import cv2
-import face_recognition
 import numpy as np
 import json
 import os
 import logging
 import datetime
+import functools
+import math
+import time
 import psycopg2
 import bcrypt
-import base64
 from cryptography.fernet import Fernet
 from psycopg2.extras import DictCursor
 import argparse 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from embedding_index import EmbeddingIndex, create_index
+from shared_store import store_from_config
+from template_format import codec_from_config
+
+# face_recognition (dlib) is imported where it is used, so the NumPy-only
+# parts of this module (matching, suppression, rosters) load without it
 
 # Configuration and logging utilities extracted from the class
 def load_config(config_file="../../config.json"):
@@ -22,11 +31,44 @@ def load_config(config_file="../../config.json"):
         "input_source": "camera",  # "camera" or path to image
         "camera_id": 0,
         "output_dir": "attendance_images",
-        "use_histogram_equalization": True,
         "use_gamma_correction": True,
         "gamma_value": 0.8,
         "face_detection_model": "hog",  # "hog" (faster) or "cnn" (more accurate)
+        "detection_resolution": {  # Faces are detected on a resized copy and encoded at full resolution
+            "strategy": "auto",  # "auto" (from min_face_size), "max_dimension" or "full"
+            "min_face_size": 40,  # "auto": smallest face to find, in full-resolution pixels; raise it for speed
+            "max_dimension": 1600,  # "max_dimension": longest side of the detection image
+            "upsample": 1  # "max_dimension" and "full": detector upsampling passes
+        },
+        "detection_tiling": {  # Split large images into overlapping tiles detected in parallel
+            "enabled": False,
+            "min_image_dimension": 3000,  # Only tile images whose longest side is at least this
+            "rows": 3,
+            "cols": 3,
+            "overlap": 0.2,  # Fraction of a tile shared with each neighbour; must cover a face
+            "min_face_size_top": 50,  # Smallest face in the top tile row (back of the hall), pixels
+            "min_face_size_bottom": 100,  # Smallest face in the bottom tile row
+            "executor": "thread",  # "thread" or "process"
+            "workers": 4,
+            "nms_threshold": 0.5  # Duplicate if overlap exceeds this fraction of the smaller box
+        },
         "recognition_tolerance": 0.6,  # Lower is stricter matching
+        "template_format": {
+            "dtype": "float32",  # "float32" or "float16" for new/migrated templates
+            "model_tag": "dlib_resnet_v1"  # Templates from other models are rejected
+        },
+        "roster_cache_check_interval": 30,  # Seconds between roster version checks
+        "embedding_index": {  # Campus-wide search when no session is given
+            "type": "auto",  # "exact", "ivf" or "auto" (ivf from ivf_threshold students)
+            "ivf_threshold": 20000,
+            "nprobe": 8,  # IVF clusters searched per face
+            "search_k": 5,  # Candidates per face for one-to-one assignment
+            "path": "embedding_index.bin"  # Encrypted with the template key
+        },
+        "shared_embedding_store": {  # Rosters memory-mapped by all recognition processes
+            "enabled": True,
+            "directory": None  # None uses /dev/shm/snapattend (or the temp dir)
+        },
         "save_attendance_images": True,
         "database": {
             "host": "localhost",
@@ -50,6 +92,11 @@ def load_config(config_file="../../config.json"):
             logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s')
             logging.info(f"Configuration loaded from '{config_file}'")
             
+            # Removed stages; their output was never used for detection
+            for key in ("use_histogram_equalization",):
+                if key in config:
+                    logging.warning(f"Config key '{key}' is ignored by the attendance pipeline")
+            
             # Merge with defaults for any missing keys
             for key, value in default_config.items():
                 if key not in config:
@@ -116,6 +163,63 @@ def get_encryption_key(config):
         return key
 
 
+# Smallest face (in pixels) the dlib HOG and CNN detectors find without upsampling
+DETECTOR_MIN_FACE_SIZE = 80
+
+
+def detect_in_tile(tile, scale, upsample, model):
+    """Detect faces in one image tile, returning boxes in tile coordinates."""
+    import face_recognition
+    
+    if scale != 1.0:
+        tile = cv2.resize(tile, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    locations = face_recognition.face_locations(tile, number_of_times_to_upsample=upsample, model=model)
+    return [tuple(int(round(v / scale)) for v in location) for location in locations]
+
+
+def non_max_suppression(boxes, threshold):
+    """Merge duplicate (top, right, bottom, left) boxes, keeping the larger one.
+    
+    Overlap is measured against the smaller box, so a face cut off at a
+    tile edge is dropped in favour of the complete detection next door.
+    """
+    if not boxes:
+        return []
+    
+    coords = np.asarray(boxes, dtype=np.float64)
+    top, right, bottom, left = coords.T
+    areas = (bottom - top) * (right - left)
+    order = np.argsort(-areas, kind="stable")
+    
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        height = np.clip(np.minimum(bottom[i], bottom[rest]) - np.maximum(top[i], top[rest]), 0, None)
+        width = np.clip(np.minimum(right[i], right[rest]) - np.maximum(left[i], left[rest]), 0, None)
+        overlap = height * width / np.maximum(np.minimum(areas[i], areas[rest]), 1.0)
+        order = rest[overlap <= threshold]
+    
+    return [boxes[i] for i in sorted(keep, key=lambda i: (boxes[i][0], boxes[i][3]))]
+
+
+@functools.lru_cache(maxsize=16)
+def gamma_lut(gamma):
+    """Lookup table mapping pixel values [0, 255] to gamma-corrected values, built once per gamma."""
+    table = ((np.arange(256) / 255.0) ** (1.0 / gamma) * 255).astype(np.uint8)
+    table.flags.writeable = False  # Shared by every caller
+    return table
+
+
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+
+# Per-pixel preprocessing stages in application order: (config flag, table
+# factory). Enabled stages are composed into a single lookup table.
+PREPROCESSING_STAGES = [
+    ("use_gamma_correction", lambda config: gamma_lut(config.get("gamma_value", 0.8))),
+]
+
+
 # Face Detection Module - Separated from recognition
 class FaceDetector:
     """Handles face detection in images."""
@@ -125,68 +229,173 @@ class FaceDetector:
         self.config = config
         self.logger = logging.getLogger("face_attendance")
         self.detection_model = config.get("face_detection_model", "hog")
+        self.tile_executor = None
+        self.preprocessing_lut = self.build_preprocessing_lut()
+        self.frame_buffers = None  # (shape, rgb) reused while the frame size stays the same
     
     def apply_gamma_correction(self, image, gamma=1.0):
         """Apply gamma correction to the image."""
-        # Build a lookup table mapping pixel values [0, 255] to adjusted gamma values
-        inv_gamma = 1.0 / gamma
-        table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)]).astype("uint8")
-        # Apply gamma correction using the lookup table
-        return cv2.LUT(image, table)
+        return cv2.LUT(image, gamma_lut(gamma))
+    
+    def build_preprocessing_lut(self):
+        """Compose the enabled preprocessing stages into one lookup table, or None if they change nothing."""
+        lut = IDENTITY_LUT
+        for flag, make_table in PREPROCESSING_STAGES:
+            if self.config.get(flag, True):
+                lut = make_table(self.config)[lut]
+        
+        if np.array_equal(lut, IDENTITY_LUT):
+            return None
+        return lut
     
     def preprocess_image(self, image):
-        """Preprocess image before face detection."""
-        # Make a copy for processing
-        processed_image = image.copy()
+        """Preprocess a BGR image into the RGB image face detection runs on.
         
-        # Apply histogram equalization if enabled
-        if self.config.get("use_histogram_equalization", True):
-            self.logger.debug("Applying histogram equalization")
-            try:
-                # Convert to grayscale for histogram equalization
-                gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                # Apply histogram equalization
-                equalized_gray = cv2.equalizeHist(gray_image)
-                self.logger.debug("Histogram equalization completed")
-            except Exception as e:
-                self.logger.error(f"Error during histogram equalization: {str(e)}")
+        The result is written into a buffer that is reused for the next
+        frame of the same size, so callers must not keep it across frames.
+        """
+        shape = image.shape
+        if self.frame_buffers is None or self.frame_buffers[0] != shape:
+            self.frame_buffers = (shape, np.empty(shape, dtype=np.uint8))
+        _, rgb_image = self.frame_buffers
         
-        # Apply gamma correction if enabled
-        if self.config.get("use_gamma_correction", True):
-            gamma_value = self.config.get("gamma_value", 0.8)
-            self.logger.debug(f"Applying gamma correction with gamma={gamma_value}")
-            try:
-                processed_image = self.apply_gamma_correction(processed_image, gamma=gamma_value)
-                self.logger.debug("Gamma correction completed")
-            except Exception as e:
-                self.logger.error(f"Error during gamma correction: {str(e)}")
+        # One pass doing the table lookup for all per-pixel stages and the channel swap face_recognition needs
+        if self.preprocessing_lut is not None:
+            np.take(self.preprocessing_lut, image[..., ::-1], out=rgb_image)
+        else:
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb_image)
+        
+        return rgb_image
+    
+    def preprocessed_copy(self, image):
+        """Return a new preprocessed BGR copy of an image, for drawing on and saving."""
+        if self.preprocessing_lut is not None:
+            return cv2.LUT(image, self.preprocessing_lut)
+        return image.copy()
+    
+    def detection_scale(self, shape):
+        """Pick the (scale, upsample) to detect faces at for an image of this shape.
+        
+        "auto" resizes so that a face of `min_face_size` pixels becomes the
+        smallest size the detector finds, upsampling only when that needs
+        more than full resolution.
+        """
+        resolution = self.config.get("detection_resolution", {})
+        strategy = resolution.get("strategy", "auto")
+        if strategy == "full":
+            return 1.0, resolution.get("upsample", 1)
+        if strategy == "max_dimension":
+            scale = resolution.get("max_dimension", 1600) / max(shape[0], shape[1])
+            return min(scale, 1.0), resolution.get("upsample", 1)
+        
+        return self.scale_for_face_size(resolution.get("min_face_size", 40))
+    
+    def scale_for_face_size(self, min_face_size):
+        """(scale, upsample) that brings a face of `min_face_size` pixels to the detector's minimum."""
+        scale = DETECTOR_MIN_FACE_SIZE / min_face_size
+        if scale >= 1.0:
+            return 1.0, math.ceil(math.log2(scale))
+        return scale, 0
+    
+    def get_tile_executor(self, tiling):
+        """Create the tile detection pool on first use."""
+        if self.tile_executor is None:
+            workers = tiling.get("workers", 4)
+            if tiling.get("executor", "thread") == "process":
+                self.tile_executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self.tile_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="face_tiles")
+        return self.tile_executor
+    
+    def locate_faces_tiled(self, rgb_image, tiling):
+        """Detect faces in overlapping tiles, each at its own detection scale.
+        
+        The expected face size is interpolated from the top tile row to the
+        bottom one, so the back of the hall is zoomed in more than the front.
+        """
+        height, width = rgb_image.shape[:2]
+        rows, cols = tiling.get("rows", 3), tiling.get("cols", 3)
+        tile_height, tile_width = math.ceil(height / rows), math.ceil(width / cols)
+        margin_y = int(tile_height * tiling.get("overlap", 0.2) / 2)
+        margin_x = int(tile_width * tiling.get("overlap", 0.2) / 2)
+        face_top = tiling.get("min_face_size_top", 50)
+        face_bottom = tiling.get("min_face_size_bottom", 100)
+        
+        executor = self.get_tile_executor(tiling)
+        futures = {}
+        for row in range(rows):
+            min_face_size = face_top + (face_bottom - face_top) * row / max(rows - 1, 1)
+            scale, upsample = self.scale_for_face_size(min_face_size)
+            y0, y1 = max(row * tile_height - margin_y, 0), min((row + 1) * tile_height + margin_y, height)
+            for col in range(cols):
+                x0, x1 = max(col * tile_width - margin_x, 0), min((col + 1) * tile_width + margin_x, width)
+                tile = rgb_image[y0:y1, x0:x1]
+                future = executor.submit(detect_in_tile, tile, scale, upsample, self.detection_model)
+                futures[future] = (y0, x0)
         
-        return processed_image
+        boxes = []
+        for future in as_completed(futures):
+            y0, x0 = futures[future]
+            for top, right, bottom, left in future.result():
+                boxes.append((
+                    max(top + y0, 0),
+                    min(right + x0, width),
+                    min(bottom + y0, height),
+                    max(left + x0, 0)
+                ))
+        
+        face_locations = non_max_suppression(boxes, tiling.get("nms_threshold", 0.5))
+        self.logger.debug(f"Tiled detection: {len(boxes)} boxes in {rows}x{cols} tiles, {len(face_locations)} after merging")
+        return face_locations
+    
+    def locate_faces(self, rgb_image):
+        """Detect face locations at the configured detection resolution, in full-resolution coordinates."""
+        import face_recognition
+        
+        tiling = self.config.get("detection_tiling", {})
+        if tiling.get("enabled", False) and max(rgb_image.shape[:2]) >= tiling.get("min_image_dimension", 3000):
+            return self.locate_faces_tiled(rgb_image, tiling)
+        
+        scale, upsample = self.detection_scale(rgb_image.shape)
+        if scale == 1.0:
+            return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=upsample, model=self.detection_model)
+        
+        small_image = cv2.resize(rgb_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        self.logger.debug(f"Detecting on {small_image.shape[1]}x{small_image.shape[0]} (scale {scale:.2f}, upsample {upsample})")
+        locations = face_recognition.face_locations(small_image, number_of_times_to_upsample=upsample, model=self.detection_model)
+        
+        # Map boxes back to the full-resolution image
+        height, width = rgb_image.shape[:2]
+        return [
+            (
+                max(int(round(top / scale)), 0),
+                min(int(round(right / scale)), width),
+                min(int(round(bottom / scale)), height),
+                max(int(round(left / scale)), 0)
+            )
+            for top, right, bottom, left in locations
+        ]
     
     def detect_faces(self, image):
-        """Detect faces in the image and return their locations and encodings."""
+        """Detect faces in the image and return it with their locations and encodings."""
+        import face_recognition
+        
         try:
-            # Preprocess the image
-            processed_image = self.preprocess_image(image)
-            
-            # Convert BGR to RGB (face_recognition works with RGB)
-            rgb_image = cv2.cvtColor(processed_image, cv2.COLOR_BGR2RGB)
+            # Preprocess the image; face_recognition works with the RGB version
+            rgb_image = self.preprocess_image(image)
             
-            # Detect face locations
+            # Detect face locations on a resized copy (or in tiles)
             self.logger.debug("Detecting faces")
-            face_locations = face_recognition.face_locations(
-                rgb_image, 
-                model=self.detection_model
-            )
+            face_locations = self.locate_faces(rgb_image)
             self.logger.info(f"Found {len(face_locations)} faces")
             
             if not face_locations:
-                return processed_image, [], []
+                return image, [], []
                 
-            # Generate face encodings for detected faces
+            # Generate face encodings for detected faces from the full-resolution image
             face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
             
-            return processed_image, face_locations, face_encodings
+            return image, face_locations, face_encodings
             
         except Exception as e:
             self.logger.error(f"Error detecting faces: {str(e)}", exc_info=True)
@@ -203,58 +412,241 @@ class FaceRecognizer:
         self.logger = logging.getLogger("face_attendance")
         self.recognition_tolerance = config.get("recognition_tolerance", 0.6)
     
-    def recognize_faces(self, face_encodings, known_students):
-        """Compare detected faces with known faces to identify students."""
-        recognized_students = []
+    def distance_matrix(self, face_encodings, roster):
+        """Euclidean distances between every detected face and every known face.
+        
+        Uses ||a||^2 + ||b||^2 - 2ab so the whole (faces x students) matrix is
+        a single float32 matrix product; the roster's squared norms are
+        precomputed when it is cached.
+        """
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, roster.encodings32.shape[1])
+        
+        distances = faces @ roster.encodings32.T
+        distances *= -2.0
+        distances += np.einsum("ij,ij->i", faces, faces)[:, None]
+        distances += roster.sq_norms[None, :]
+        # Rounding can make near-identical vectors slightly negative
+        np.maximum(distances, 0.0, out=distances)
+        return np.sqrt(distances, out=distances)
+    
+    def assign_matches(self, distances):
+        """Pair faces with students one-to-one, closest pairs first.
         
+        Returns the matched student index for each face, or -1. A face whose
+        best candidate was claimed by a closer face falls back to its next
+        candidate within tolerance.
+        """
+        assignment = np.full(distances.shape[0], -1, dtype=np.int64)
+        faces, students = np.nonzero(distances <= self.recognition_tolerance)
+        if not len(faces):
+            return assignment
+        
+        order = np.argsort(distances[faces, students], kind="stable")
+        taken = np.zeros(distances.shape[1], dtype=bool)
+        remaining = len(np.unique(faces))
+        for face, student in zip(faces[order], students[order]):
+            if assignment[face] >= 0 or taken[student]:
+                continue
+            assignment[face] = student
+            taken[student] = True
+            remaining -= 1
+            if not remaining:
+                break
+        return assignment
+    
+    def recognize_with_index(self, face_encodings, index):
+        """Identify faces against a campus-wide embedding index."""
+        if index is None or not len(index) or not len(face_encodings):
+            return [{"student_id": None, "name": "Unknown", "recognized": False, "confidence": None} for _ in face_encodings]
+        
+        k = self.config.get("embedding_index", {}).get("search_k", 5)
+        candidate_distances, candidate_ids = index.search(face_encodings, k)
+        
+        # Dense faces x candidates matrix so the one-to-one assignment can be reused
+        student_ids = np.unique(candidate_ids[candidate_ids >= 0])
+        distances = np.full((len(candidate_ids), len(student_ids)), np.inf, dtype=np.float32)
+        rows, cols = np.nonzero(candidate_ids >= 0)
+        distances[rows, np.searchsorted(student_ids, candidate_ids[rows, cols])] = candidate_distances[rows, cols]
+        
+        recognized_students = []
+        for face_index, student_index in enumerate(self.assign_matches(distances)):
+            if student_index < 0:
+                recognized_students.append({'student_id': None, 'name': "Unknown", 'recognized': False, 'confidence': None})
+                continue
+            student_id = int(student_ids[student_index])
+            recognized_students.append({
+                'student_id': student_id,
+                'name': index.names[student_id],
+                'recognized': True,
+                'confidence': 1.0 - float(distances[face_index, student_index])
+            })
+        return recognized_students
+    
+    def recognize_faces(self, face_encodings, roster):
+        """Compare detected faces with a cached roster to identify students."""
         # If no known students, return all as unknown
-        if not known_students or not face_encodings:
-            return [{"student_id": None, "name": "Unknown", "recognized": False} for _ in face_encodings]
-        
-        # Extract just the face encodings for comparison
-        known_face_encodings = [s['face_encoding'] for s in known_students]
-        
-        for face_encoding in face_encodings:
-            # Default name is "Unknown"
-            name = "Unknown"
-            student_id = None
-            match_found = False
-            
-            # Compare face with known faces
-            matches = face_recognition.compare_faces(
-                known_face_encodings, 
-                face_encoding,
-                tolerance=self.recognition_tolerance
-            )
-            
-            # Get distances to all known faces
-            face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-            
-            confidence = None
-            if any(matches):
-                # Get the index of the best (smallest) distance
-                best_match_index = np.argmin(face_distances)
-                
-                if matches[best_match_index]:
-                    student = known_students[best_match_index]
-                    name = student['name']
-                    student_id = student['student_id']
-                    match_found = True
-                    # Convert distance to a simple "confidence" score (closer = higher confidence)
-                    confidence = 1.0 - float(face_distances[best_match_index])
-
+        if roster is None or not len(roster.student_ids) or not len(face_encodings):
+            return [{"student_id": None, "name": "Unknown", "recognized": False, "confidence": None} for _ in face_encodings]
+        
+        distances = self.distance_matrix(face_encodings, roster)
+        assignment = self.assign_matches(distances)
+        
+        recognized_students = []
+        for face_index, student_index in enumerate(assignment):
+            if student_index < 0:
+                recognized_students.append({
+                    'student_id': None,
+                    'name': "Unknown",
+                    'recognized': False,
+                    'confidence': None
+                })
+                continue
             
-            # Add to recognized students list
+            # Convert distance to a simple "confidence" score (closer = higher confidence)
             recognized_students.append({
-                'student_id': student_id, 
-                'name': name,
-                'recognized': match_found,
-                'confidence': confidence
+                'student_id': int(roster.student_ids[student_index]),
+                'name': roster.names[student_index],
+                'recognized': True,
+                'confidence': 1.0 - float(distances[face_index, student_index])
             })
                 
         return recognized_students
 
 
+# Roster Embedding Cache
+class Roster:
+    """Decrypted face encodings of a set of students as one contiguous matrix."""
+    
+    def __init__(self, student_ids, names, encodings, version, sq_norms=None, shared=None):
+        self.student_ids = student_ids  # int64 array, row i of encodings
+        self.names = names
+        self.encodings = encodings  # (n, 128) float32 matrix
+        # Matching uses precomputed squared norms
+        self.encodings32 = np.ascontiguousarray(encodings, dtype=np.float32)
+        if sq_norms is None:
+            sq_norms = np.einsum("ij,ij->i", self.encodings32, self.encodings32)
+        self.sq_norms = sq_norms
+        self.shared = shared  # SharedRoster the arrays are mapped from, if any
+        self.version = version
+        self.checked_at = time.monotonic()
+
+
+class RosterEmbeddingCache:
+    """Keeps decrypted roster embeddings in memory, one Roster per classroom.
+    
+    Rosters are rebuilt only when a cheap version query shows that the
+    enrollments or face templates changed, and that query runs at most once
+    per `roster_cache_check_interval` seconds, so recognizing an image
+    normally needs neither database access nor decryption.
+    
+    A classroom roster is also persisted as one encrypted bundle in
+    classroom_embedding_bundles, stamped with the version it was built
+    from, so a cold process loads it with a single row read and a single
+    decryption instead of decrypting every template.
+    
+    With a shared embedding store, the decrypted roster is published to a
+    memory-mapped file and every process maps that file instead of keeping
+    its own copy.
+    """
+    
+    def __init__(self, config, db_manager):
+        """Initialize an empty cache."""
+        self.logger = logging.getLogger("face_attendance")
+        self.db_manager = db_manager
+        self.check_interval = config.get("roster_cache_check_interval", 30)
+        self.shared_store = store_from_config(config, db_manager.encryption_key)
+        self.rosters = {}  # classroom_id (None for all students) -> Roster
+    
+    def get_roster(self, classroom_id=None):
+        """Return the roster of a classroom, rebuilding it if it changed."""
+        roster = self.rosters.get(classroom_id)
+        if roster is not None and time.monotonic() - roster.checked_at < self.check_interval:
+            return roster
+        
+        version = self.db_manager.get_roster_version(classroom_id)
+        if roster is not None and version is not None and roster.version == version:
+            roster.checked_at = time.monotonic()
+            return roster
+        
+        roster = self.build_roster(classroom_id, version)
+        self.rosters[classroom_id] = roster
+        return roster
+    
+    def build_roster(self, classroom_id, version):
+        """Map a classroom's shared Roster, or load it from its bundle or face templates and publish it."""
+        roster_version = "|".join(str(v) for v in version) if version is not None else None
+        share = self.shared_store is not None and roster_version is not None
+        if share:
+            roster = self.map_shared(classroom_id, roster_version, version)
+            if roster is not None:
+                return roster
+        
+        roster = self.load_roster(classroom_id, roster_version, version)
+        if share:
+            try:
+                self.shared_store.publish(classroom_id, roster_version, roster.student_ids, roster.names, roster.encodings)
+                return self.map_shared(classroom_id, roster_version, version) or roster
+            except Exception as e:
+                self.logger.warning(f"Could not publish shared roster for classroom {classroom_id}: {str(e)}")
+        return roster
+    
+    def map_shared(self, classroom_id, roster_version, version):
+        """Map the shared roster file if it was built from the current roster version."""
+        shared = self.shared_store.open(classroom_id, roster_version)
+        if shared is None:
+            return None
+        
+        self.logger.info(f"Mapped {len(shared.student_ids)} shared face encodings for classroom {classroom_id}")
+        return Roster(shared.student_ids, shared.names, shared.encodings, version, sq_norms=shared.sq_norms, shared=shared)
+    
+    def load_roster(self, classroom_id, roster_version, version):
+        """Load a classroom's Roster from its bundle, or decrypt its face templates and save a new bundle."""
+        use_bundle = classroom_id is not None and roster_version is not None
+        if use_bundle:
+            roster = self.load_bundle(classroom_id, roster_version, version)
+            if roster is not None:
+                return roster
+        
+        students = self.db_manager.get_all_student_face_encodings(classroom_id)
+        
+        student_ids = np.fromiter((s['student_id'] for s in students), dtype=np.int64, count=len(students))
+        names = [s['name'] for s in students]
+        encodings = np.empty((len(students), 128), dtype=np.float32)
+        for i, student in enumerate(students):
+            encodings[i] = student['face_encoding']
+        
+        if use_bundle:
+            bundle = self.db_manager.codec.encode_bundle(student_ids, names, encodings)
+            self.db_manager.save_embedding_bundle(classroom_id, roster_version, len(students), bundle)
+        
+        self.logger.info(f"Cached {len(students)} face encodings for classroom {classroom_id}")
+        return Roster(student_ids, names, encodings, version)
+    
+    def load_bundle(self, classroom_id, roster_version, version):
+        """Decrypt a classroom's stored bundle if it was built from the current roster version."""
+        stored = self.db_manager.get_embedding_bundle(classroom_id)
+        if stored is None or stored[0] != roster_version:
+            return None
+        
+        codec = self.db_manager.codec
+        try:
+            student_ids, names, encodings = codec.decode_bundle(stored[1], model_tag=codec.model_tag)
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable embedding bundle for classroom {classroom_id}: {str(e)}")
+            return None
+        
+        self.logger.info(f"Loaded {len(student_ids)} face encodings for classroom {classroom_id} from its bundle")
+        return Roster(student_ids, names, encodings, version)
+    
+    def invalidate(self, classroom_id=None):
+        """Drop cached rosters; all of them when no classroom is given."""
+        if classroom_id is None:
+            self.rosters.clear()
+        else:
+            self.rosters.pop(classroom_id, None)
+            self.rosters.pop(None, None)
+
+
 # Database Module
 class DatabaseManager:
     """Handles database operations for the attendance system."""
@@ -268,6 +660,7 @@ class DatabaseManager:
         # Initialize encryption
         self.encryption_key = get_encryption_key(config)
         self.fernet = Fernet(self.encryption_key)
+        self.codec = codec_from_config(config, self.encryption_key)
     
     def connect_to_db(self):
         """Connect to the PostgreSQL database."""
@@ -296,32 +689,23 @@ class DatabaseManager:
             self.logger.info("Database connection closed")
     
     def encrypt_face_encoding(self, face_encoding):
-        """Encrypt face encoding for secure storage."""
-        # Convert numpy array to bytes
-        face_bytes = base64.b64encode(face_encoding.tobytes())
-        # Encrypt the bytes
-        encrypted_data = self.fernet.encrypt(face_bytes)
-        return encrypted_data
+        """Encrypt face encoding for secure storage in the versioned template format."""
+        return self.codec.encode(face_encoding)
 
     def decrypt_face_encoding(self, encrypted_data):
-        """Decrypt face encoding from database."""
+        """Decrypt face encoding from database (versioned or legacy Fernet template)."""
         try:
             # If it's coming from psycopg2 as a memoryview or similar, convert to bytes
-            if not isinstance(encrypted_data, (str, bytes)):
-                encrypted_data = bytes(encrypted_data)
+            if isinstance(encrypted_data, str):
+                encrypted_data = encrypted_data.encode()
                 
-            # Decrypt the data
-            decrypted_bytes = self.fernet.decrypt(encrypted_data)
-            
-            # Convert back to numpy array
-            face_array = np.frombuffer(base64.b64decode(decrypted_bytes), dtype=np.float64)
-            return face_array
+            return self.codec.decode(encrypted_data, model_tag=self.codec.model_tag)
         except Exception as e:
             self.logger.error(f"Error decrypting face encoding: {str(e)}")
             return None
     
-    def get_all_student_face_encodings(self, classroom_id=None):
-        """Retrieve all student face encodings from the database, optionally filtered by classroom."""
+    def get_all_student_face_encodings(self, classroom_id=None, updated_since=None):
+        """Retrieve all student face encodings from the database, optionally filtered by classroom or update time."""
         try:
             conn = self.connect_to_db()
             with conn.cursor(cursor_factory=DictCursor) as cursor:
@@ -334,6 +718,12 @@ class DatabaseManager:
                     WHERE ce.classroom_id = %s AND s.face_template IS NOT NULL
                     """
                     cursor.execute(query, (classroom_id,))
+                elif updated_since is not None:
+                    # Get faces registered or changed since a previous sync
+                    cursor.execute(
+                        "SELECT student_id, name, face_template FROM students WHERE face_template IS NOT NULL AND updated_at >= %s",
+                        (updated_since,)
+                    )
                 else:
                     # Get all student faces
                     cursor.execute(
@@ -341,6 +731,7 @@ class DatabaseManager:
                     )
                 
                 students = cursor.fetchall()
+            conn.commit()  # Don't leave the read transaction open
                 
             # Process and return student data with decrypted face encodings
             result = []
@@ -361,8 +752,124 @@ class DatabaseManager:
             self.logger.error(f"Error retrieving student face encodings: {str(e)}")
             return []
     
+    def get_roster_version(self, classroom_id=None):
+        """Get a stamp that changes whenever a roster's enrollments or face templates change."""
+        try:
+            conn = self.connect_to_db()
+            with conn.cursor() as cursor:
+                if classroom_id is not None:
+                    cursor.execute(
+                        """
+                        SELECT count(*), max(ce.updated_at), max(s.updated_at)
+                        FROM classroom_enrollments ce
+                        JOIN students s ON s.student_id = ce.student_id
+                        WHERE ce.classroom_id = %s
+                        """,
+                        (classroom_id,)
+                    )
+                else:
+                    cursor.execute("SELECT count(*), NULL, max(updated_at) FROM students")
+                version = cursor.fetchone()
+            conn.commit()
+            return version
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving roster version: {str(e)}")
+            if self.db_conn is not None and not self.db_conn.closed:
+                self.db_conn.rollback()
+            return None
+    
+    def get_embedding_bundle(self, classroom_id):
+        """Get (roster_version, bundle) of a classroom's stored embedding bundle."""
+        try:
+            conn = self.connect_to_db()
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT roster_version, bundle FROM classroom_embedding_bundles WHERE classroom_id = %s",
+                    (classroom_id,)
+                )
+                result = cursor.fetchone()
+            conn.commit()
+            return (result[0], bytes(result[1])) if result else None
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving embedding bundle for classroom {classroom_id}: {str(e)}")
+            if self.db_conn is not None and not self.db_conn.closed:
+                self.db_conn.rollback()
+            return None
+    
+    def save_embedding_bundle(self, classroom_id, roster_version, student_count, bundle):
+        """Store or replace a classroom's embedding bundle."""
+        try:
+            conn = self.connect_to_db()
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO classroom_embedding_bundles (classroom_id, roster_version, student_count, bundle)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (classroom_id) DO UPDATE
+                    SET roster_version = EXCLUDED.roster_version,
+                        student_count = EXCLUDED.student_count,
+                        bundle = EXCLUDED.bundle,
+                        created_at = now()
+                    """,
+                    (classroom_id, roster_version, student_count, bundle)
+                )
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error saving embedding bundle for classroom {classroom_id}: {str(e)}")
+            if self.db_conn is not None and not self.db_conn.closed:
+                self.db_conn.rollback()
+            return False
+    
+    def get_template_stamp(self):
+        """Get (count, latest update) of students with face templates."""
+        try:
+            conn = self.connect_to_db()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT count(*), max(updated_at) FROM students WHERE face_template IS NOT NULL")
+                count, updated_at = cursor.fetchone()
+            conn.commit()
+            return count, updated_at
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving face template stamp: {str(e)}")
+            return None
+    
+    def get_templated_student_ids(self):
+        """Get the ids of all students with a face template."""
+        try:
+            conn = self.connect_to_db()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT student_id FROM students WHERE face_template IS NOT NULL")
+                student_ids = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+            return student_ids
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving students with face templates: {str(e)}")
+            return None
+    
+    def get_classroom_id_for_session(self, session_id):
+        """Get the classroom a class session belongs to."""
+        try:
+            conn = self.connect_to_db()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT classroom_id FROM class_sessions WHERE session_id = %s", (session_id,))
+                result = cursor.fetchone()
+            conn.commit()
+            return result[0] if result else None
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving classroom for session {session_id}: {str(e)}")
+            return None
+    
     def register_student_face(self, student_id, image_path):
         """Register a student's face in the database."""
+        import face_recognition
+        
         try:
             # Load image and detect face
             image = face_recognition.load_image_file(image_path)
@@ -430,6 +937,33 @@ class DatabaseManager:
             self.logger.error(f"Error recording attendance: {str(e)}")
             return False
     
+    def record_attendance_batch(self, session_id, student_ids, status="present"):
+        """Record attendance for many students of a class session in one statement."""
+        if not student_ids:
+            return True
+        try:
+            conn = self.connect_to_db()
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO attendances (session_id, student_id, status, marked_by)
+                    SELECT %s, student_id, %s, 'system' FROM unnest(%s::int[]) AS student_id
+                    ON CONFLICT (session_id, student_id) DO UPDATE
+                    SET status = EXCLUDED.status, marked_by = 'system', updated_at = now()
+                    """,
+                    (session_id, status, sorted(student_ids))
+                )
+            conn.commit()
+            
+            self.logger.info(f"Recorded {status} attendance for {len(student_ids)} students in session {session_id}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error recording attendance batch: {str(e)}")
+            if self.db_conn is not None and not self.db_conn.closed:
+                self.db_conn.rollback()
+            return False
+    
     def get_active_class_sessions(self):
         """Get active class sessions based on current time."""
         try:
@@ -496,6 +1030,7 @@ class FaceAttendanceSystem:
     def __init__(self, config_file="config.json"):
         """Initialize the face attendance system components."""
         # Load configuration
+        self.config_file = config_file
         self.config = load_config(config_file)
         # Set up logging
         self.logger = setup_logging(self.config)
@@ -504,44 +1039,60 @@ class FaceAttendanceSystem:
         self.db_manager = DatabaseManager(self.config)
         self.face_detector = FaceDetector(self.config)
         self.face_recognizer = FaceRecognizer(self.config)
+        self.roster_cache = RosterEmbeddingCache(self.config, self.db_manager)
+        self.embedding_index = None
+        self.embedding_index_checked_at = None
+        self.session_classrooms = {}  # session_id -> classroom_id, never changes
+    
+    def get_session_classroom_id(self, session_id):
+        """Get the classroom of a class session, cached since it never changes."""
+        classroom_id = self.session_classrooms.get(session_id)
+        if classroom_id is None:
+            classroom_id = self.db_manager.get_classroom_id_for_session(session_id)
+            if classroom_id is not None:
+                self.session_classrooms[session_id] = classroom_id
+        return classroom_id
     
-    def process_image(self, image, session_id=None):
-        """Process an image to detect, recognize faces and record attendance."""
+    def process_image(self, image, session_id=None, record=True, annotate=True):
+        """Process an image to detect, recognize faces and record attendance unless `record` is False.
+        
+        Returns a new preprocessed copy of the image with the faces drawn on,
+        or the input image itself when `annotate` is False.
+        """
         try:
             # Detect faces
-            processed_image, face_locations, face_encodings = self.face_detector.detect_faces(image)
+            _, face_locations, face_encodings = self.face_detector.detect_faces(image)
             
             if not face_locations:
                 self.logger.info("No faces detected in the image")
-                return processed_image, []
-            
-            # Get student face encodings from database
-            classroom_id = None
-            if session_id:
-                # Get classroom_id from session_id
-                conn = self.db_manager.connect_to_db()
-                with conn.cursor() as cursor:
-                    cursor.execute("SELECT classroom_id FROM class_sessions WHERE session_id = %s", (session_id,))
-                    result = cursor.fetchone()
-                    if result:
-                        classroom_id = result[0]
-                
-            known_students = self.db_manager.get_all_student_face_encodings(classroom_id)
+                return self.face_detector.preprocessed_copy(image) if annotate else image, []
             
-            # Recognize faces
-            recognized_students = self.face_recognizer.recognize_faces(face_encodings, known_students)
+            # Get student face encodings from the roster cache
+            classroom_id = self.get_session_classroom_id(session_id) if session_id else None
+                
+            # Recognize faces against the classroom roster, or campus-wide
+            if classroom_id is not None:
+                roster = self.roster_cache.get_roster(classroom_id)
+                recognized_students = self.face_recognizer.recognize_faces(face_encodings, roster)
+            else:
+                index = self.get_embedding_index()
+                recognized_students = self.face_recognizer.recognize_with_index(face_encodings, index)
             
             # Add face locations to recognized students for drawing
             for i, student in enumerate(recognized_students):
                 student['location'] = face_locations[i]
             
             # Record attendance if session_id is provided
-            if session_id is not None:
+            if session_id is not None and record:
                 for student in recognized_students:
                     if student['recognized']:
                         self.db_manager.record_attendance(session_id, student['student_id'])
             
-            # Draw face rectangles and names on the image
+            if not annotate:
+                return image, recognized_students
+            
+            # Draw face rectangles and names on a preprocessed copy of the image
+            processed_image = self.face_detector.preprocessed_copy(image)
             for student in recognized_students:
                 top, right, bottom, left = student['location']
                 
@@ -573,8 +1124,12 @@ class FaceAttendanceSystem:
             self.logger.error(f"Error processing image: {str(e)}", exc_info=True)
             return image, []
     
-    def process_single_image(self, image_path, session_id=None):
-        """Process a single image file for attendance tracking."""
+    def process_single_image(self, image_path, session_id=None, record=True):
+        """Process a single image file for attendance tracking.
+        
+        Returns the annotated image when "save_attendance_images" is set,
+        otherwise the image as read from the file.
+        """
         try:
             # Load image file
             image = cv2.imread(image_path)
@@ -584,11 +1139,12 @@ class FaceAttendanceSystem:
                 
             self.logger.info(f"Processing image: {image_path}")
             
-            # Process the image
-            processed_image, recognized_students = self.process_image(image, session_id)
+            # Process the image, drawing on a copy only when it will be saved
+            save_image = self.config.get("save_attendance_images", True)
+            processed_image, recognized_students = self.process_image(image, session_id, record, annotate=save_image)
             
             # Save the processed image if configured
-            if self.config.get("save_attendance_images", True):
+            if save_image:
                 output_dir = self.config.get("output_dir", "attendance_images")
                 os.makedirs(output_dir, exist_ok=True)
                 
@@ -619,8 +1175,13 @@ class FaceAttendanceSystem:
             self.logger.error(f"Error processing image file: {str(e)}", exc_info=True)
             return None, []
     
-    def process_image_folder(self, folder_path, session_id=None):
-        """Process all images in a folder for attendance tracking."""
+    def process_image_folder(self, folder_path, session_id=None, workers=1):
+        """Process all images in a folder for attendance tracking.
+        
+        With `workers` > 1 images are processed in a pool of worker
+        processes; 0 uses one worker per CPU. Attendance is recorded once
+        for the whole folder.
+        """
         try:
             self.logger.info(f"Processing images in folder: {folder_path}")
             
@@ -642,12 +1203,24 @@ class FaceAttendanceSystem:
             
             self.logger.info(f"Found {len(image_files)} image files")
             
+            if workers == 0:
+                workers = os.cpu_count() or 1
+            workers = min(workers, len(image_files))
+            
             # Process each image
-            results = []
-            for image_path in image_files:
-                processed_image, recognized_students = self.process_single_image(image_path, session_id)
-                if processed_image is not None:
-                    results.append((image_path, recognized_students))
+            if workers > 1:
+                results = self.process_images_in_pool(image_files, session_id, workers)
+            else:
+                results = []
+                for image_path in image_files:
+                    processed_image, recognized_students = self.process_single_image(image_path, session_id, record=False)
+                    if processed_image is not None:
+                        results.append((image_path, recognized_students))
+            
+            # Record everyone seen in any image in one write
+            if session_id is not None:
+                student_ids = {s['student_id'] for _, students in results for s in students if s['recognized']}
+                self.db_manager.record_attendance_batch(session_id, student_ids)
             
             # Summarize results
             if results:
@@ -682,12 +1255,152 @@ class FaceAttendanceSystem:
             self.logger.error(f"Error processing image folder: {str(e)}", exc_info=True)
             return []
     
+    def process_images_in_pool(self, image_files, session_id, workers):
+        """Process images in worker processes, collecting results as they complete."""
+        # Build and publish the roster first so workers map it instead of each decrypting it
+        if session_id is not None:
+            classroom_id = self.get_session_classroom_id(session_id)
+            if classroom_id is not None:
+                self.roster_cache.get_roster(classroom_id)
+        
+        self.logger.info(f"Processing {len(image_files)} images with {workers} worker processes")
+        results = []
+        # Spawned workers don't inherit this process's database connection
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_folder_worker,
+            initargs=(self.config_file,)
+        ) as executor:
+            futures = {executor.submit(_process_folder_image, image_path, session_id): image_path for image_path in image_files}
+            for future in as_completed(futures):
+                try:
+                    processed, recognized_students = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error processing image {futures[future]} in worker: {str(e)}")
+                    continue
+                
+                if processed:
+                    results.append((futures[future], recognized_students))
+                    recognized_count = sum(1 for s in recognized_students if s['recognized'])
+                    self.logger.info(f"Finished {futures[future]}: recognized {recognized_count} of {len(recognized_students)} faces ({len(results)}/{len(image_files)})")
+        
+        return results
+    
+    def register_student_face(self, student_id, image_path):
+        """Register a student's face and drop cached rosters that may include them."""
+        registered = self.db_manager.register_student_face(student_id, image_path)
+        if registered:
+            self.roster_cache.invalidate()
+            # Picked up incrementally by the next index sync
+            self.embedding_index_checked_at = None
+        return registered
+    
+    def get_embedding_index(self):
+        """Return the campus-wide embedding index, loading, syncing or building it as needed.
+        
+        The persisted index records the template stamp it was built from; when
+        the stamp moved on, only students updated since then are decrypted and
+        added, and students who lost their template are removed.
+        """
+        check_interval = self.config.get("roster_cache_check_interval", 30)
+        if (self.embedding_index is not None and self.embedding_index_checked_at is not None
+                and time.monotonic() - self.embedding_index_checked_at < check_interval):
+            return self.embedding_index
+        
+        stamp = self.db_manager.get_template_stamp()
+        if stamp is None:
+            return self.embedding_index
+        stamp_text = f"{stamp[0]}@{stamp[1].isoformat() if stamp[1] else ''}"
+        
+        index = self.embedding_index or self.load_embedding_index()
+        if index is not None and index.stamp == stamp_text:
+            self.embedding_index, self.embedding_index_checked_at = index, time.monotonic()
+            return index
+        
+        if index is None or not index.stamp:
+            # Full build
+            students = self.db_manager.get_all_student_face_encodings()
+            index = create_index(self.config, size_hint=len(students))
+        else:
+            # Incremental sync since the previous stamp
+            since = index.stamp.partition("@")[2]
+            students = self.db_manager.get_all_student_face_encodings(
+                updated_since=datetime.datetime.fromisoformat(since) if since else None
+            )
+            current_ids = self.db_manager.get_templated_student_ids()
+            if current_ids is not None:
+                index.remove(set(index.names) - current_ids)
+        
+        if students:
+            index.add(
+                [s['student_id'] for s in students],
+                [s['name'] for s in students],
+                np.stack([s['face_encoding'] for s in students])
+            )
+        index.stamp = stamp_text
+        self.logger.info(f"Embedding index ({index.kind}) holds {len(index)} students")
+        
+        self.save_embedding_index(index)
+        self.embedding_index, self.embedding_index_checked_at = index, time.monotonic()
+        return index
+    
+    def load_embedding_index(self):
+        """Load the persisted embedding index, or None if missing or unreadable."""
+        index_config = self.config.get("embedding_index", {})
+        path = index_config.get("path")
+        if not path or not os.path.exists(path):
+            return None
+        
+        try:
+            with open(path, "rb") as f:
+                data = self.db_manager.fernet.decrypt(f.read())
+            return EmbeddingIndex.from_bytes(data, nprobe=index_config.get("nprobe", 8))
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable embedding index {path}: {str(e)}")
+            return None
+    
+    def save_embedding_index(self, index):
+        """Persist the embedding index, encrypted like the templates it came from."""
+        path = self.config.get("embedding_index", {}).get("path")
+        if not path:
+            return
+        
+        try:
+            data = self.db_manager.fernet.encrypt(index.to_bytes())
+            temp_path = f"{path}.tmp"
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception as e:
+            self.logger.error(f"Error saving embedding index: {str(e)}")
+    
     def close(self):
         """Clean up resources used by the system."""
+        if self.face_detector.tile_executor is not None:
+            self.face_detector.tile_executor.shutdown()
         self.db_manager.close_db_connection()
         self.logger.info("Face attendance system shut down")
 
 
+# Worker processes for FaceAttendanceSystem.process_images_in_pool
+_worker_system = None
+
+
+def _init_folder_worker(config_file):
+    """Load the config, models and database connection once per worker process."""
+    global _worker_system
+    _worker_system = FaceAttendanceSystem(config_file=config_file)
+
+
+def _process_folder_image(image_path, session_id):
+    """Process one image in a worker; attendance is recorded by the parent."""
+    processed_image, recognized_students = _worker_system.process_single_image(image_path, session_id, record=False)
+    return processed_image is not None, recognized_students
+
+
 def main():
     """Main function to run the attendance system."""
     parser = argparse.ArgumentParser(description="Face Attendance System")
@@ -696,6 +1409,7 @@ def main():
     parser.add_argument("--classroom", "-c", type=int, help="Classroom ID to track attendance for")
     parser.add_argument("--session", "-s", type=int, help="Session ID to record attendance for")
     parser.add_argument("--config", type=str, default="../../config.json", help="Path to config file")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Worker processes for --folder (0 = one per CPU)")
     args = parser.parse_args()
     
     system = FaceAttendanceSystem(config_file=args.config)
@@ -718,7 +1432,7 @@ def main():
             system.process_single_image(args.image, session_id)
         elif args.folder:
             # Process all images in a folder
-            system.process_image_folder(args.folder, session_id)
+            system.process_image_folder(args.folder, session_id, workers=args.workers)
         else:
             system.logger.error("No input specified. Use --image or --folder to specify input.")
             
@@ -3,12 +3,13 @@
 
 import os
 import sys
-import base64
 
 import face_recognition
 import psycopg2
 from cryptography.fernet import Fernet
 
+from template_format import TemplateCodec
+
 # —————————————————————————————————————————————————————————————
 # Configuration (hard‑coded)
 # —————————————————————————————————————————————————————————————
@@ -35,7 +36,7 @@ def get_fernet_key(key_file: str) -> bytes:
         print(f"[INFO] Generated new Fernet key → {key_file}")
         return key
 
-fernet = Fernet(get_fernet_key(KEY_FILE))
+codec = TemplateCodec(get_fernet_key(KEY_FILE))
 
 # —————————————————————————————————————————————————————————————
 # DB Connection
@@ -64,9 +65,8 @@ def register_face(student_number: int, student_name: str, image_path: str):
         return
     encoding = face_recognition.face_encodings(image, [locs[0]])[0]
 
-    # 2) Encrypt encoding
-    raw = base64.b64encode(encoding.tobytes())
-    encrypted = fernet.encrypt(raw)
+    # 2) Encrypt encoding (versioned template format)
+    encrypted = codec.encode(encoding)
 
     # 3) Connect & upsert student
     conn = connect_db()
@@ -0,0 +1,96 @@
+"""
+Rewrite stored face templates into the versioned template format.
+
+Legacy Fernet templates are decrypted and re-encrypted in batches, one
+transaction per batch, so the tool can be interrupted and rerun safely;
+templates already in the current format are skipped.
+
+    python migrate_templates.py --config ../../config.json --batch-size 500
+"""
+import argparse
+
+from psycopg2.extras import execute_values
+
+from face_detector import DatabaseManager, load_config, setup_logging
+from template_format import MAGIC, VERSION
+
+
+def migrate_templates(db_manager, batch_size=500, dry_run=False):
+    """Migrate all legacy templates; returns (migrated, failed) counts."""
+    logger = db_manager.logger
+    codec = db_manager.codec
+    conn = db_manager.connect_to_db()
+    prefix = MAGIC + bytes([VERSION])
+
+    last_id, migrated, failed = 0, 0, 0
+    while True:
+        with conn.cursor() as cursor:
+            # Keyset pagination over students still holding legacy templates
+            cursor.execute(
+                """
+                SELECT student_id, face_template
+                FROM students
+                WHERE student_id > %s
+                    AND face_template IS NOT NULL
+                    AND substring(face_template FROM 1 FOR 4) <> %s
+                ORDER BY student_id
+                LIMIT %s
+                """,
+                (last_id, prefix, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                conn.commit()
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for student_id, template in rows:
+                try:
+                    encoding = codec.decode(template)
+                except Exception as e:
+                    logger.error(f"Cannot decrypt template of student {student_id}: {str(e)}")
+                    failed += 1
+                    continue
+                updates.append((student_id, codec.encode(encoding)))
+
+            if updates and not dry_run:
+                execute_values(
+                    cursor,
+                    """
+                    UPDATE students SET face_template = v.face_template
+                    FROM (VALUES %s) AS v (student_id, face_template)
+                    WHERE students.student_id = v.student_id
+                    """,
+                    updates
+                )
+            conn.commit()
+
+        migrated += len(updates)
+        logger.info(f"Migrated {migrated} templates so far (up to student {last_id})")
+
+    return migrated, failed
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Migrate face templates to the versioned format")
+    parser.add_argument("--config", type=str, default="../../config.json", help="Path to config file")
+    parser.add_argument("--batch-size", type=int, default=500, help="Templates rewritten per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Decrypt and re-encode without writing")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    logger = setup_logging(config)
+    db_manager = DatabaseManager(config)
+
+    try:
+        migrated, failed = migrate_templates(db_manager, args.batch_size, args.dry_run)
+        action = "Checked" if args.dry_run else "Migrated"
+        logger.info(f"{action} {migrated} templates, {failed} could not be decrypted")
+    finally:
+        db_manager.close_db_connection()
+
+
+if __name__ == "__main__":
+    main()
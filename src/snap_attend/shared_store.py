@@ -0,0 +1,179 @@
+"""
+Memory-mapped roster embeddings shared by all recognition processes.
+
+One file per roster under a configurable directory (by default on
+/dev/shm, so it never reaches disk), created with mode 0600:
+
+    magic        3 bytes   b"SAS"
+    version      1 byte    1
+    count        uint32
+    dim          uint32
+    stamp_len    uint32
+    names_len    uint32
+    stamp        stamp_len  roster version the file was built from
+    names        names_len  UTF-8 JSON list of student names
+    padding      up to a 64-byte boundary
+    student_ids  count int64
+    encodings    count x dim float32
+    sq_norms     count float32
+    mac          32 bytes   HMAC-SHA256 of everything above
+
+Files hold decrypted vectors, so they are only as private as the directory
+permissions; the MAC key is derived with HKDF from the template key, so a
+process without that key can neither forge a roster nor have its files
+accepted. Readers map the file read-only and wrap it in numpy arrays
+without copying, so N processes share one copy in the page cache. Writers
+publish through a temporary file and os.replace, so readers always see a
+complete file and keep their old mapping until they remap.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"SAS"
+VERSION = 1
+HEADER = struct.Struct("<3sBIIII")
+ALIGNMENT = 64
+MAC_SIZE = 32
+
+
+def default_directory():
+    """Shared memory when the platform has it, otherwise the temp directory."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "snapattend")
+
+
+class SharedRoster:
+    """Zero-copy arrays over a mapped roster file."""
+
+    def __init__(self, mapping, student_ids, names, encodings, sq_norms):
+        self.mapping = mapping  # Keeps the mapping alive as long as the arrays
+        self.student_ids = student_ids
+        self.names = names
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+
+
+class SharedEmbeddingStore:
+    """Publishes rosters to mapped files and maps them back."""
+
+    def __init__(self, directory, fernet_key):
+        """Create the store directory and derive the MAC key."""
+        self.logger = logging.getLogger("face_attendance")
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        self.mac_key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b"snapattend shared roster v1",
+        ).derive(base64.urlsafe_b64decode(fernet_key))
+
+    def path(self, classroom_id):
+        """File of a classroom roster; None is the campus-wide roster."""
+        name = "all" if classroom_id is None else f"classroom_{int(classroom_id)}"
+        return os.path.join(self.directory, f"roster_{name}.bin")
+
+    def publish(self, classroom_id, roster_version, student_ids, names, encodings):
+        """Write a roster file and atomically swap it in."""
+        encodings = np.ascontiguousarray(encodings, dtype="<f4").reshape(len(student_ids), -1)
+        count, dim = encodings.shape
+        stamp = roster_version.encode("utf-8")
+        names_json = json.dumps(list(names)).encode("utf-8")
+
+        header = HEADER.pack(MAGIC, VERSION, count, dim, len(stamp), len(names_json)) + stamp + names_json
+        header += b"\0" * (-len(header) % ALIGNMENT)
+        parts = [
+            header,
+            np.ascontiguousarray(student_ids, dtype="<i8").tobytes(),
+            encodings.tobytes(),
+            np.einsum("ij,ij->i", encodings, encodings).astype("<f4").tobytes(),
+        ]
+        mac = hmac.new(self.mac_key, digestmod=hashlib.sha256)
+        for part in parts:
+            mac.update(part)
+
+        path = self.path(classroom_id)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for part in parts:
+                    f.write(part)
+                f.write(mac.digest())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def open(self, classroom_id, roster_version):
+        """Map a roster file built from `roster_version`, or None if missing, stale or invalid."""
+        path = self.path(classroom_id)
+        try:
+            with open(path, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None  # Missing or empty
+
+        try:
+            if len(mapping) < HEADER.size + MAC_SIZE:
+                raise ValueError("truncated file")
+            magic, version, count, dim, stamp_len, names_len = HEADER.unpack_from(mapping)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"unsupported format {magic!r} v{version}")
+
+            names_offset = HEADER.size + stamp_len
+            if mapping[HEADER.size:names_offset].decode("utf-8") != roster_version:
+                mapping.close()
+                return None  # Stale; the caller rebuilds and republishes
+
+            data_offset = names_offset + names_len
+            data_offset += -data_offset % ALIGNMENT
+            encodings_offset = data_offset + count * 8
+            norms_offset = encodings_offset + count * dim * 4
+            if len(mapping) != norms_offset + count * 4 + MAC_SIZE:
+                raise ValueError("size does not match header")
+
+            with memoryview(mapping) as view:
+                mac = hmac.new(self.mac_key, view[:-MAC_SIZE], hashlib.sha256).digest()
+                valid = hmac.compare_digest(mac, view[-MAC_SIZE:])
+            if not valid:
+                raise ValueError("MAC mismatch")
+
+            return SharedRoster(
+                mapping,
+                np.frombuffer(mapping, dtype="<i8", count=count, offset=data_offset),
+                json.loads(mapping[names_offset:names_offset + names_len].decode("utf-8")),
+                np.frombuffer(mapping, dtype="<f4", count=count * dim, offset=encodings_offset).reshape(count, dim),
+                np.frombuffer(mapping, dtype="<f4", count=count, offset=norms_offset),
+            )
+        except Exception as e:
+            self.logger.warning(f"Ignoring invalid shared roster {path}: {str(e)}")
+            mapping.close()
+            return None
+
+
+def store_from_config(config, fernet_key):
+    """Create the store configured under "shared_embedding_store", or None if disabled."""
+    store_config = config.get("shared_embedding_store", {})
+    if not store_config.get("enabled", True):
+        return None
+
+    directory = store_config.get("directory") or default_directory()
+    try:
+        return SharedEmbeddingStore(directory, fernet_key)
+    except OSError as e:
+        logging.getLogger("face_attendance").warning(f"Shared embedding store disabled, cannot use {directory}: {str(e)}")
+        return None
@@ -0,0 +1,149 @@
+"""
+Versioned binary format for encrypted face templates.
+
+Layout (version 1):
+
+    magic    3 bytes   b"SAT"
+    version  1 byte    1
+    dtype    1 byte    1 = float32, 2 = float16
+    tag_len  1 byte
+    tag      tag_len   ASCII model tag, e.g. "dlib_resnet_v1"
+    nonce    12 bytes
+    payload  AES-256-GCM(embedding bytes) + 16-byte auth tag
+
+The header is authenticated as associated data, so a template cannot be
+relabelled with another dtype or model. The AES key is derived with HKDF
+from the existing Fernet key, so no new secret has to be distributed.
+Legacy templates (Fernet token of base64 float64 bytes) are still read.
+
+Roster bundles use the same header with magic b"SAB" and pack a whole
+classroom into one AEAD message: count and dimension, the int64 student
+ids, the embedding matrix and the JSON-encoded names.
+"""
+import base64
+import json
+import os
+import struct
+
+import numpy as np
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"SAT"
+BUNDLE_MAGIC = b"SAB"
+VERSION = 1
+DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+DTYPE_CODES = {"float32": 1, "float16": 2}
+DEFAULT_MODEL_TAG = "dlib_resnet_v1"
+NONCE_SIZE = 12
+
+
+class TemplateCodec:
+    """Encodes face encodings into the versioned format and decodes both formats."""
+
+    def __init__(self, fernet_key, dtype="float32", model_tag=DEFAULT_MODEL_TAG):
+        """Derive the AEAD key from the Fernet key and pick the storage dtype."""
+        if dtype not in DTYPE_CODES:
+            raise ValueError(f"Unsupported template dtype '{dtype}', use one of {sorted(DTYPE_CODES)}")
+        self.fernet = Fernet(fernet_key)
+        self.dtype_code = DTYPE_CODES[dtype]
+        self.model_tag = model_tag
+        self.header = self.make_header(self.dtype_code, model_tag)
+
+        key_material = base64.urlsafe_b64decode(fernet_key)
+        self.aead = AESGCM(
+            HKDF(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=None,
+                info=b"snapattend face template v1",
+            ).derive(key_material)
+        )
+
+    @staticmethod
+    def make_header(dtype_code, model_tag, magic=MAGIC):
+        """Build the authenticated header for a dtype and model tag."""
+        tag = model_tag.encode("ascii")
+        return magic + struct.pack("BBB", VERSION, dtype_code, len(tag)) + tag
+
+    def _open(self, data, magic, model_tag):
+        """Check a header and decrypt the payload; returns (dtype_code, payload)."""
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        version, dtype_code, tag_len = struct.unpack_from("BBB", data, len(magic))
+        if version != VERSION or dtype_code not in DTYPES:
+            raise ValueError(f"Unsupported template version {version} / dtype {dtype_code}")
+
+        header_len = len(magic) + 3 + tag_len
+        header = data[:header_len]
+        tag = header[len(magic) + 3:].decode("ascii")
+        if model_tag is not None and tag != model_tag:
+            raise ValueError(f"Template was produced by model '{tag}', expected '{model_tag}'")
+
+        nonce = data[header_len:header_len + NONCE_SIZE]
+        return dtype_code, self.aead.decrypt(nonce, data[header_len + NONCE_SIZE:], header)
+
+    def encode(self, encoding):
+        """Encrypt a face encoding into the versioned format."""
+        payload = np.ascontiguousarray(encoding, dtype=DTYPES[self.dtype_code]).tobytes()
+        nonce = os.urandom(NONCE_SIZE)
+        return self.header + nonce + self.aead.encrypt(nonce, payload, self.header)
+
+    def decode(self, data, model_tag=None):
+        """Decrypt a stored template (either format) into a float32 array.
+
+        When `model_tag` is given, templates produced by another model are
+        rejected rather than silently compared.
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        if not data.startswith(MAGIC):
+            # Legacy: Fernet(base64(float64 bytes))
+            raw = base64.b64decode(self.fernet.decrypt(data))
+            return np.frombuffer(raw, dtype=np.float64).astype(np.float32)
+
+        dtype_code, payload = self._open(data, MAGIC, model_tag)
+        return np.frombuffer(payload, dtype=DTYPES[dtype_code]).astype(np.float32)
+
+    def encode_bundle(self, student_ids, names, encodings):
+        """Pack and encrypt a whole roster into one bundle."""
+        dtype = DTYPES[self.dtype_code]
+        encodings = np.ascontiguousarray(encodings, dtype=dtype).reshape(len(student_ids), -1)
+        payload = b"".join([
+            struct.pack("<II", *encodings.shape),
+            np.ascontiguousarray(student_ids, dtype="<i8").tobytes(),
+            encodings.tobytes(),
+            json.dumps(list(names)).encode("utf-8"),
+        ])
+
+        header = self.make_header(self.dtype_code, self.model_tag, BUNDLE_MAGIC)
+        nonce = os.urandom(NONCE_SIZE)
+        return header + nonce + self.aead.encrypt(nonce, payload, header)
+
+    def decode_bundle(self, data, model_tag=None):
+        """Decrypt a bundle into (student_ids, names, float32 encodings)."""
+        dtype_code, payload = self._open(data, BUNDLE_MAGIC, model_tag)
+        dtype = DTYPES[dtype_code]
+
+        count, dim = struct.unpack_from("<II", payload)
+        offset = 8
+        student_ids = np.frombuffer(payload, dtype="<i8", count=count, offset=offset).astype(np.int64)
+        offset += count * 8
+        encodings = np.frombuffer(payload, dtype=dtype, count=count * dim, offset=offset)
+        offset += count * dim * dtype.itemsize
+        names = json.loads(payload[offset:].decode("utf-8"))
+        return student_ids, names, encodings.astype(np.float32).reshape(count, dim)
+
+
+def codec_from_config(config, fernet_key):
+    """Create the codec configured under "template_format"."""
+    template_config = config.get("template_format", {})
+    return TemplateCodec(
+        fernet_key,
+        dtype=template_config.get("dtype", "float32"),
+        model_tag=template_config.get("model_tag", DEFAULT_MODEL_TAG),
+    )
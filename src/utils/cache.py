@@ -0,0 +1,246 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+from ..database.invalidation import invalidation_bus
+from .etag import is_not_modified, not_modified
+
+# A tag is (table, key); key None means "any row of the table". In the
+# decorator a string key names the endpoint argument holding the key.
+Tag = Tuple[str, Optional[object]]
+
+
+class _Entry:
+    __slots__ = ("body", "status_code", "headers", "media_type", "tags", "expires")
+
+    def __init__(self, response: Response, tags: Set[Tag], expires: float):
+        self.body = response.body
+        self.status_code = response.status_code
+        self.headers = {
+            k: v for k, v in response.headers.items() if k.lower() != "content-length"
+        }
+        self.media_type = response.media_type
+        self.tags = tags
+        self.expires = expires
+
+    def to_response(self) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            headers=self.headers,
+            media_type=self.media_type,
+        )
+
+
+class ResponseCache:
+    """LRU of rendered responses evicted by table/key tags.
+
+    Entries are dropped when the invalidation bus reports a write to one of
+    their tags, when the byte budget is exceeded (least recently used
+    first), or after `ttl` seconds as a backstop for writes made outside
+    DatabaseOperations.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_tag: Dict[Tag, Set[str]] = {}
+        self._size = 0
+        self._generations: Dict[str, int] = {}
+        self._subscribed: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def watch(self, table: str):
+        """Evict entries tagged with `table` whenever it changes"""
+        with self._lock:
+            if table in self._subscribed:
+                return
+            self._subscribed.add(table)
+        invalidation_bus.subscribe(
+            table, functools.partial(self.invalidate, table)
+        )
+
+    def generation(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Invalidation counters of tables, to detect writes during a render"""
+        with self._lock:
+            return tuple(self._generations.get(t, 0) for t in tables)
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(
+        self,
+        key: str,
+        response: Response,
+        tags: Set[Tag],
+        generation: Tuple[int, ...],
+        ttl: Optional[float] = None,
+    ):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        entry = _Entry(response, tags, time.monotonic() + ttl)
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            # A write landed while rendering; the response may already be stale
+            tables = sorted({table for table, _ in tags})
+            if tuple(self._generations.get(t, 0) for t in tables) != generation:
+                return
+
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += size
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, table: str, keys: Optional[list] = None):
+        """Evict entries depending on the given rows (or any row) of a table"""
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+            if keys is None:
+                tags = [tag for tag in self._by_tag if tag[0] == table]
+            else:
+                tags = [(table, None)] + [(table, key) for key in keys]
+
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self._size = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+response_cache = ResponseCache(
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300)),
+)
+
+
+def _cache_key(request: Request, current_user: Optional[Dict]) -> str:
+    query = "&".join(sorted(request.url.query.split("&")))
+    user = (
+        f"{current_user['role']}:{current_user['user_id']}" if current_user else "-"
+    )
+    return f"{request.method} {request.url.path}?{query}|{user}"
+
+
+def cached(
+    tags: List[Tag],
+    cache: ResponseCache = response_cache,
+    bucket_seconds: Optional[int] = None,
+):
+    """Cache an endpoint's response per path, query and user.
+
+    `tags` lists the (table, key) pairs the response depends on; a string
+    key is read from the endpoint argument of that name, None depends on
+    the whole table. Responses that also depend on the clock set
+    `bucket_seconds`; they are cached per wall-clock bucket of that length
+    (aligned like date_trunc), so a new bucket renders afresh. The endpoint
+    must return a Response (fast_response, FastJSONResponse); other results
+    and errors are never cached.
+    """
+
+    def decorator(endpoint):
+        signature = inspect.signature(endpoint)
+        request_param = next(
+            (
+                name
+                for name, param in signature.parameters.items()
+                if param.annotation is Request
+            ),
+            None,
+        )
+        if request_param is None:
+            # Ask FastAPI for the request without changing the endpoint
+            request_param = "_cache_request"
+            signature = signature.replace(
+                parameters=[
+                    *signature.parameters.values(),
+                    inspect.Parameter(
+                        request_param,
+                        inspect.Parameter.KEYWORD_ONLY,
+                        annotation=Request,
+                    ),
+                ]
+            )
+            passes_request = False
+        else:
+            passes_request = True
+
+        tables = sorted({table for table, _ in tags})
+        for table in tables:
+            cache.watch(table)
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request = kwargs[request_param] if passes_request else kwargs.pop(
+                request_param
+            )
+            key = _cache_key(request, kwargs.get("current_user"))
+            ttl = None
+            if bucket_seconds:
+                now = time.time()
+                key = f"{key}|{int(now // bucket_seconds)}"
+                ttl = bucket_seconds - now % bucket_seconds
+
+            entry = cache.get(key)
+            if entry is not None:
+                etag = entry.headers.get("etag")
+                if etag and is_not_modified(request, etag):
+                    return not_modified(etag)
+                return entry.to_response()
+
+            generation = cache.generation(tables)
+            response = await endpoint(*args, **kwargs)
+
+            if (
+                isinstance(response, Response)
+                and response.status_code == 200
+                and hasattr(response, "body")
+            ):
+                resolved = {
+                    (table, kwargs.get(k) if isinstance(k, str) else k)
+                    for table, k in tags
+                }
+                cache.put(key, response, resolved, generation, ttl)
+            return response
+
+        wrapper.__signature__ = signature
+        return wrapper
+
+    return decorator
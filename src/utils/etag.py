@@ -0,0 +1,49 @@
+import hashlib
+from typing import Dict
+
+from fastapi import Request, Response
+
+# Clients may keep responses but must revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(request: Request, current_user: Dict, version: str) -> str:
+    """Build a weak ETag from a scope version stamp.
+
+    The stamp comes from a cheap max(updated_at)/count(*) query; the URL and
+    user are mixed in because the same scope renders differently per view.
+    """
+    key = "|".join(
+        [
+            request.url.path,
+            request.url.query,
+            f"{current_user['role']}:{current_user['user_id']}",
+            version or "",
+        ]
+    )
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]}"'
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    """Headers to attach to a response carrying an ETag"""
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check the If-None-Match header against an ETag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return opaque(etag) in {opaque(tag) for tag in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response for an unchanged resource"""
+    return Response(status_code=304, headers=etag_headers(etag))
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+class Resync:
+    """Queue marker standing in for events dropped from a full queue"""
+
+    def __init__(self, oldest: Any, dropped: int):
+        self.oldest = oldest  # Earliest dropped event by the bus's order key
+        self.dropped = dropped
+
+
+class EventBus:
+    """In-process pub/sub fanning events out to asyncio subscribers.
+
+    Publishing is thread-safe so the database listener thread can feed it;
+    each subscriber gets a bounded queue and, when it falls behind, has its
+    backlog replaced by a single Resync marker rather than slowing everybody
+    else down, so it knows to refetch what it missed.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 256,
+        order_key: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.max_queue_size = max_queue_size
+        self.order_key = order_key
+        self._subscribers: Dict[
+            Hashable, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, keys: Iterable[Hashable]) -> asyncio.Queue:
+        """Create a queue receiving events published under any of `keys`"""
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            for key in keys:
+                self._subscribers[key].add(entry)
+        return queue
+
+    def unsubscribe(self, keys: Iterable[Hashable], queue: asyncio.Queue):
+        """Stop delivering events to a queue"""
+        with self._lock:
+            for key in keys:
+                entries = self._subscribers.get(key)
+                if not entries:
+                    continue
+                entries.difference_update({e for e in entries if e[1] is queue})
+                if not entries:
+                    del self._subscribers[key]
+
+    def publish(self, key: Hashable, event: Any):
+        """Deliver an event to every subscriber of `key`, from any thread"""
+        with self._lock:
+            entries = list(self._subscribers.get(key, ()))
+
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # Subscriber's loop is closed; it will be dropped on unsubscribe
+                continue
+
+    def _put(self, queue: asyncio.Queue, event: Any):
+        if queue.full():
+            resync = None
+            while not queue.empty():
+                item = queue.get_nowait()
+                if not isinstance(item, Resync):
+                    item = Resync(item, 1)
+                if resync is None:
+                    resync = item
+                else:
+                    if self.order_key and self.order_key(item.oldest) < self.order_key(resync.oldest):
+                        resync.oldest = item.oldest
+                    resync.dropped += item.dropped
+            queue.put_nowait(resync)
+        queue.put_nowait(event)
+
+
+# Attendance changes keyed by session_id; commits can land out of `since`
+# order, so a resync resumes from the earliest one dropped
+attendance_events = EventBus(order_key=lambda event: event["since"])
@@ -0,0 +1,183 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import os
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from ..models.idempotency_key import IdempotencyKey
+from .responses import FastJSONResponse
+
+# How long a completed response is replayed for duplicates
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60))
+
+# How long a duplicate waits for the first request before giving up; also the
+# lease after which a claim abandoned by a crashed worker can be taken over
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 300))
+
+# Polling interval for duplicates in flight on another worker
+POLL_INTERVAL_SECONDS = 0.25
+
+MAX_KEY_LENGTH = 255
+
+# Requests in flight in this process, so local duplicates wait without polling
+_inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def _replay(entry: Dict) -> Response:
+    return Response(
+        content=bytes(entry["response_body"]),
+        status_code=entry["status_code"],
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _render(request: Request, result, status_code: int) -> Response:
+    """Render an endpoint result the way its route would, response_model included"""
+    if isinstance(result, Response):
+        return result
+
+    route = request.scope.get("route")
+    model = getattr(route, "response_model", None)
+    if model is not None:
+        adapter = TypeAdapter(model)
+        result = adapter.dump_python(
+            adapter.validate_python(result, from_attributes=True),
+            mode="json",
+            include=route.response_model_include,
+            exclude=route.response_model_exclude,
+            by_alias=route.response_model_by_alias,
+            exclude_unset=route.response_model_exclude_unset,
+            exclude_defaults=route.response_model_exclude_defaults,
+            exclude_none=route.response_model_exclude_none,
+        )
+    return FastJSONResponse(jsonable_encoder(result), status_code=status_code)
+
+
+def idempotent(status_code: int = 200):
+    """Honour an `Idempotency-Key` header on a POST endpoint.
+
+    The first request with a key runs the endpoint and stores its response;
+    duplicates from the same user replay it until it expires, and duplicates
+    arriving while it is still running wait for it. Reusing a key for a
+    different request body is rejected with 422. Failed requests are not
+    stored, so a retry runs again. `status_code` must match the route's.
+    Keyed requests return the response rendered through the route's
+    response_model, and that exact body is what duplicates replay.
+    """
+
+    def decorator(endpoint):
+        signature = inspect.signature(endpoint)
+        request_param = next(
+            (
+                name
+                for name, param in signature.parameters.items()
+                if param.annotation is Request
+            ),
+            None,
+        )
+        passes_request = request_param is not None
+        if not passes_request:
+            # Ask FastAPI for the request without changing the endpoint
+            request_param = "_idempotency_request"
+            signature = signature.replace(
+                parameters=[
+                    *signature.parameters.values(),
+                    inspect.Parameter(
+                        request_param,
+                        inspect.Parameter.KEYWORD_ONLY,
+                        annotation=Request,
+                    ),
+                ]
+            )
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request = kwargs[request_param] if passes_request else kwargs.pop(
+                request_param
+            )
+            key = request.headers.get("idempotency-key")
+            if not key:
+                return await endpoint(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters",
+                )
+
+            current_user = kwargs.get("current_user") or {}
+            scope = f"{current_user.get('role')}:{current_user.get('user_id')}"
+            request_hash = hashlib.sha256(
+                b"\n".join(
+                    [
+                        request.method.encode(),
+                        request.url.path.encode(),
+                        await request.body(),
+                    ]
+                )
+            ).hexdigest()
+
+            slot = (scope, key)
+            deadline = time.monotonic() + IDEMPOTENCY_LOCK_SECONDS
+            while True:
+                inflight = _inflight.get(slot)
+                if inflight is not None:
+                    await asyncio.shield(inflight)
+                    continue
+
+                if IdempotencyKey.claim(
+                    scope, key, request_hash, IDEMPOTENCY_LOCK_SECONDS
+                ):
+                    break
+
+                entry = IdempotencyKey.get(scope, key)
+                if entry is None:
+                    continue  # Expired in between; claim it
+                if entry["request_hash"] != request_hash:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Idempotency-Key was already used for a different request",
+                    )
+                if entry["status_code"] is not None:
+                    return _replay(entry)
+                if time.monotonic() > deadline:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="A request with this Idempotency-Key is still in progress",
+                    )
+
+                # Running on another worker
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+            future = asyncio.get_running_loop().create_future()
+            _inflight[slot] = future
+            try:
+                response = _render(
+                    request, await endpoint(*args, **kwargs), status_code
+                )
+                IdempotencyKey.complete(
+                    scope,
+                    key,
+                    response.status_code,
+                    response.body,
+                    IDEMPOTENCY_TTL_SECONDS,
+                )
+                IdempotencyKey.purgeExpired()
+                return response
+            except BaseException:
+                IdempotencyKey.release(scope, key)
+                raise
+            finally:
+                del _inflight[slot]
+                future.set_result(None)
+
+        wrapper.__signature__ = signature
+        return wrapper
+
+    return decorator
@@ -0,0 +1,146 @@
+import base64
+import functools
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from fastapi import HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, create_model
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _encode_default(value: Any) -> Any:
+    """Encode values the JSON encoders do not handle natively"""
+    if isinstance(value, (bytes, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_encode_default)
+        return json.dumps(
+            content,
+            default=_encode_default,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+def model_field_names(model: Type[BaseModel]) -> List[str]:
+    """Field names of a pydantic model (v1 or v2)"""
+    fields = getattr(model, "model_fields", None)
+    if fields is None:
+        fields = model.__fields__
+    return list(fields)
+
+
+def project_row(row: dict, names: Iterable[str]) -> dict:
+    """Keep only the given columns of a row"""
+    return {name: row.get(name) for name in names}
+
+
+@functools.lru_cache(maxsize=None)
+def sparse_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """Copy of a response model with every field optional, for routes taking `fields`.
+
+    Responses carry every field unless the request names a subset, so the
+    documented schema cannot mark them required.
+    """
+    fields = getattr(model, "model_fields", None)
+    if fields is not None:
+        types = {name: field.annotation for name, field in fields.items()}
+    else:
+        types = {name: field.outer_type_ for name, field in model.__fields__.items()}
+
+    return create_model(
+        f"Sparse{model.__name__}",
+        __doc__=f"{model.__name__} restricted to the fields requested with `fields`",
+        **{name: (Optional[annotation], None) for name, annotation in types.items()},
+    )
+
+
+def sparse_fields(model: Type[BaseModel]):
+    """Build a dependency parsing a `fields=a,b` query parameter.
+
+    The dependency returns the requested field names, validated against
+    `model`, or all of its fields when the parameter is omitted. Routes
+    using it declare `sparse_model(model)` as their response model.
+    """
+    allowed = model_field_names(model)
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None, description=f"Comma-separated subset of: {', '.join(allowed)}"
+        )
+    ) -> List[str]:
+        requested = list(
+            dict.fromkeys(
+                name.strip() for name in (fields or "").split(",") if name.strip()
+            )
+        )
+        if not requested:
+            return allowed
+
+        unknown = [name for name in requested if name not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}",
+            )
+        return requested
+
+    return dependency
+
+
+def fast_response(
+    rows: Iterable[dict],
+    model: Optional[Type[BaseModel]] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    fields: Optional[List[str]] = None,
+) -> FastJSONResponse:
+    """Serialize trusted database rows without pydantic validation.
+
+    Rows are trimmed to the fields of `model` (or the `fields` subset of
+    them) so columns that the response model hides (password hashes, for
+    example) never leave the server.
+    """
+    if model is not None:
+        names = fields or model_field_names(model)
+        rows = [project_row(row, names) for row in rows]
+    else:
+        rows = list(rows)
+    return FastJSONResponse(rows, status_code=status_code, headers=headers)
+
+
+def changes_response(
+    since: Optional[datetime],
+    until: datetime,
+    changed: Iterable[dict],
+    deleted: List[int],
+    model: Type[BaseModel],
+) -> FastJSONResponse:
+    """Serialize a delta sync page without pydantic validation"""
+    names = model_field_names(model)
+    return FastJSONResponse(
+        {
+            "since": since,
+            "until": until,
+            "changed": [project_row(row, names) for row in changed],
+            "deleted": deleted,
+        }
+    )
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# API modules import as `src.…`; the face pipeline imports its siblings as
+# top-level modules, as when its scripts run from src/snap_attend
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src", "snap_attend"))
+
+
+@pytest.fixture
+def database():
+    """The application database; tests using it are skipped when it is unreachable"""
+    from src.database.connection import db
+
+    try:
+        db.connect()
+    except ConnectionError as e:
+        pytest.skip(str(e))
+    return db
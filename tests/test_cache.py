@@ -0,0 +1,102 @@
+import asyncio
+
+from fastapi import Request, Response
+
+from src.utils import cache as cache_module
+from src.utils.cache import ResponseCache, cached
+
+
+def make_request(path="/items", query=b""):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query,
+            "headers": [],
+        }
+    )
+
+
+def counting_endpoint(**cached_kwargs):
+    calls = []
+    response_cache = ResponseCache(max_bytes=1024 * 1024, ttl=300)
+
+    @cached(cache=response_cache, **cached_kwargs)
+    async def endpoint(request: Request):
+        calls.append(request.url.path)
+        return Response(content=str(len(calls)).encode())
+
+    def call(**kwargs):
+        return asyncio.run(endpoint(request=make_request(), **kwargs)).body
+
+    return call, calls, response_cache
+
+
+def test_clock_bucketed_entries_are_rendered_again_in_a_new_bucket(monkeypatch):
+    call, calls, _ = counting_endpoint(tags=[("cache_test_clock", None)], bucket_seconds=60)
+    clock = [1_000_040.0]  # 20 s into a minute
+    monkeypatch.setattr(cache_module.time, "time", lambda: clock[0])
+
+    assert call() == b"1"
+    clock[0] += 30  # Same minute
+    assert call() == b"1"
+    clock[0] += 15  # Next minute
+    assert call() == b"2"
+    assert len(calls) == 2
+
+
+def test_write_to_a_tagged_row_evicts_only_entries_depending_on_it():
+    from src.database.invalidation import invalidation_bus, make_event
+
+    response_cache = ResponseCache(max_bytes=1024 * 1024, ttl=300)
+    response_cache.watch("cache_test_rows")
+    generation = response_cache.generation(["cache_test_rows"])
+    response_cache.put("row 1", Response(b"one"), {("cache_test_rows", 1)}, generation)
+    response_cache.put("row 2", Response(b"two"), {("cache_test_rows", 2)}, generation)
+    response_cache.put("table", Response(b"all"), {("cache_test_rows", None)}, generation)
+
+    invalidation_bus.dispatch(make_event("cache_test_rows", [{"row_id": 1}], "row_id"))
+
+    assert response_cache.get("row 1") is None
+    assert response_cache.get("table") is None
+    assert response_cache.get("row 2").body == b"two"
+
+    invalidation_bus.dispatch(make_event("cache_test_rows"))  # Keys unknown
+
+    assert response_cache.get("row 2") is None
+
+
+def test_response_rendered_during_a_write_is_not_stored():
+    response_cache = ResponseCache(max_bytes=1024 * 1024, ttl=300)
+    generation = response_cache.generation(["cache_test_race"])
+
+    response_cache.invalidate("cache_test_race", [1])
+    response_cache.put("stale", Response(b"old"), {("cache_test_race", 1)}, generation)
+
+    assert response_cache.get("stale") is None
+
+
+def test_least_recently_used_entries_are_evicted_past_the_byte_budget():
+    response_cache = ResponseCache(max_bytes=10, ttl=300)
+    generation = response_cache.generation(["cache_test_lru"])
+    tags = {("cache_test_lru", None)}
+
+    response_cache.put("a", Response(b"aaaa"), tags, generation)
+    response_cache.put("b", Response(b"bbbb"), tags, generation)
+    response_cache.get("a")
+    response_cache.put("c", Response(b"cccc"), tags, generation)
+
+    assert response_cache.get("b") is None
+    assert response_cache.get("a") is not None and response_cache.get("c") is not None
+
+
+def test_cached_endpoint_renders_again_after_invalidation():
+    from src.database.invalidation import invalidation_bus, make_event
+
+    call, calls, _ = counting_endpoint(tags=[("cache_test_endpoint", None)])
+
+    assert call() == call() == b"1"
+    invalidation_bus.dispatch(make_event("cache_test_endpoint"))
+    assert call() == b"2"
+    assert len(calls) == 2
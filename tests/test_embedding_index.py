@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from embedding_index import EmbeddingIndex, ExactIndex, IVFIndex
+
+DIM = 16
+
+
+def clustered_vectors(n, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(scale=4.0, size=(8, DIM))
+    return (centres[rng.integers(0, 8, n)] + rng.normal(scale=0.3, size=(n, DIM))).astype(np.float32)
+
+
+def build(index_class, vectors, **options):
+    index = index_class(dim=DIM, **options)
+    ids = np.arange(1, len(vectors) + 1)
+    index.add(ids, [f"Student {i}" for i in ids], vectors)
+    return index
+
+
+@pytest.mark.parametrize("index_class", [ExactIndex, IVFIndex])
+def test_search_finds_each_stored_vector_first(index_class):
+    vectors = clustered_vectors(400)
+    index = build(index_class, vectors)
+
+    distances, ids = index.search(vectors[:50], k=3)
+
+    assert ids.shape == distances.shape == (50, 3)
+    assert ids[:, 0].tolist() == list(range(1, 51))
+    np.testing.assert_allclose(distances[:, 0], 0.0, atol=1e-2)
+    assert (np.diff(distances, axis=1) >= 0).all()
+
+
+def test_ivf_matches_exact_search_when_probing_every_cluster():
+    vectors = clustered_vectors(300)
+    queries = clustered_vectors(20, seed=1)
+    exact = build(ExactIndex, vectors)
+    ivf = build(IVFIndex, vectors, nlist=8, nprobe=8)
+
+    exact_distances, exact_ids = exact.search(queries, k=5)
+    ivf_distances, ivf_ids = ivf.search(queries, k=5)
+
+    assert ivf_ids.tolist() == exact_ids.tolist()
+    np.testing.assert_allclose(ivf_distances, exact_distances, rtol=1e-4)
+
+
+def test_ivf_add_replaces_and_remove_drops_students():
+    vectors = clustered_vectors(200)
+    index = build(IVFIndex, vectors, nprobe=8)
+
+    index.add([5], ["Renamed"], vectors[100])  # Student 5 now looks like student 101
+    index.remove([101, 999])
+
+    assert len(index) == 199
+    assert 101 not in index and 5 in index
+    assert index.names[5] == "Renamed"
+    _, ids = index.search(vectors[100], k=1)
+    assert ids[0, 0] == 5
+
+
+def test_search_pads_missing_neighbours():
+    index = build(IVFIndex, clustered_vectors(2))
+
+    distances, ids = index.search(clustered_vectors(1, seed=3), k=4)
+
+    assert ids[0, 2:].tolist() == [-1, -1]
+    assert np.isinf(distances[0, 2:]).all()
+
+
+@pytest.mark.parametrize("index_class", [ExactIndex, IVFIndex])
+def test_npz_round_trip_preserves_results(index_class):
+    vectors = clustered_vectors(300)
+    index = build(index_class, vectors)
+    index.stamp = "300|2025-05-01 10:00:00"
+    index.remove([7])
+
+    restored = EmbeddingIndex.from_bytes(index.to_bytes())
+
+    assert type(restored) is index_class
+    assert restored.stamp == index.stamp
+    assert restored.names == index.names
+    queries = clustered_vectors(10, seed=2)
+    for original, loaded in zip(index.search(queries, k=5), restored.search(queries, k=5)):
+        np.testing.assert_array_equal(original, loaded)
@@ -0,0 +1,50 @@
+import asyncio
+
+from src.utils.events import EventBus, Resync
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def publish_all(bus, key, events):
+    async def run():
+        queue = bus.subscribe([key])
+        for event in events:
+            bus.publish(key, event)
+        await asyncio.sleep(0)  # Let the call_soon_threadsafe deliveries run
+        return drain(queue)
+
+    return asyncio.run(run())
+
+
+def test_events_are_delivered_in_order_while_the_queue_has_room():
+    bus = EventBus(max_queue_size=4)
+
+    assert publish_all(bus, 1, ["a", "b", "c"]) == ["a", "b", "c"]
+
+
+def test_overflow_replaces_the_backlog_with_a_resync_marker():
+    bus = EventBus(max_queue_size=4, order_key=lambda event: event["since"])
+    events = [{"since": s} for s in ["t5", "t3", "t9", "t8", "t7"]]
+
+    items = publish_all(bus, 1, events)
+
+    assert isinstance(items[0], Resync)
+    assert items[0].dropped == 4
+    assert items[0].oldest == {"since": "t3"}
+    assert items[1:] == [{"since": "t7"}]
+
+
+def test_repeated_overflows_merge_into_one_marker():
+    bus = EventBus(max_queue_size=4, order_key=lambda event: event["since"])
+    events = [{"since": f"t{i:02}"} for i in [5, 3, 9, 8, 7, 1, 6, 4, 2, 0, 11]]
+
+    items = publish_all(bus, 1, events)
+
+    assert [type(item) for item in items] == [Resync, dict]
+    assert items[0].dropped == 10
+    assert items[0].oldest == {"since": "t00"}
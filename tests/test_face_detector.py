@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from face_detector import FaceDetector, load_config  # noqa: E402
+
+FRAME = (3000, 4000, 3)
+
+
+def test_default_detection_resolution_matches_full_resolution_with_one_upsample():
+    config = load_config("missing-config.json")
+    assert FaceDetector(config).detection_scale(FRAME) == (1.0, 1)
+
+
+@pytest.mark.parametrize(
+    "resolution, expected",
+    [
+        ({"strategy": "auto", "min_face_size": 40}, (1.0, 1)),
+        ({"strategy": "auto", "min_face_size": 20}, (1.0, 2)),
+        ({"strategy": "auto", "min_face_size": 80}, (1.0, 0)),
+        ({"strategy": "auto", "min_face_size": 160}, (0.5, 0)),
+        ({"strategy": "full", "upsample": 1}, (1.0, 1)),
+        ({"strategy": "max_dimension", "max_dimension": 1000, "upsample": 2}, (0.25, 2)),
+        ({"strategy": "max_dimension", "max_dimension": 8000}, (1.0, 1)),
+    ],
+)
+def test_detection_scale(resolution, expected):
+    detector = FaceDetector({"detection_resolution": resolution})
+    assert detector.detection_scale(FRAME) == expected
+
+
+def test_locations_found_on_a_downscaled_copy_are_mapped_back(monkeypatch):
+    pytest.importorskip("face_recognition")
+    seen = []
+
+    def face_locations(image, number_of_times_to_upsample=1, model="hog"):
+        seen.append((image.shape[:2], number_of_times_to_upsample))
+        return [(40, 120, 120, 40)]
+
+    monkeypatch.setattr("face_recognition.face_locations", face_locations)
+    detector = FaceDetector({"detection_resolution": {"strategy": "auto", "min_face_size": 160}})
+
+    assert detector.locate_faces(np.zeros(FRAME, dtype=np.uint8)) == [(80, 240, 240, 80)]
+    assert seen == [((1500, 2000), 0)]
+
+
+def test_removed_histogram_equalization_key_is_reported(tmp_path, caplog):
+    config_file = tmp_path / "config.json"
+    config_file.write_text('{"use_histogram_equalization": true}')
+
+    load_config(str(config_file))
+
+    assert "'use_histogram_equalization' is ignored" in caplog.text
+
+
+def test_preprocess_image_applies_the_lut_and_swaps_channels_in_one_pass():
+    import cv2
+
+    detector = FaceDetector({"use_gamma_correction": True, "gamma_value": 0.8})
+    image = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+    expected = cv2.cvtColor(cv2.LUT(image, detector.preprocessing_lut), cv2.COLOR_BGR2RGB)
+    assert np.array_equal(detector.preprocess_image(image), expected)
+
+
+def test_preprocessed_copy_is_not_the_reused_frame_buffer():
+    detector = FaceDetector({"use_gamma_correction": True, "gamma_value": 0.8})
+    image = np.full((48, 64, 3), 100, dtype=np.uint8)
+
+    rgb_image = detector.preprocess_image(image)
+    copy = detector.preprocessed_copy(image)
+    detector.preprocess_image(np.zeros_like(image))
+
+    assert not np.shares_memory(copy, rgb_image)
+    assert np.array_equal(copy, detector.preprocessing_lut[image])
+
+
+def make_roster(encodings):
+    from face_detector import Roster
+
+    encodings = np.asarray(encodings, dtype=np.float32)
+    return Roster(
+        np.arange(101, 101 + len(encodings), dtype=np.int64),
+        [f"Student {i}" for i in range(len(encodings))],
+        encodings,
+        version=None,
+    )
+
+
+def test_distance_matrix_matches_pairwise_euclidean_distances():
+    from face_detector import FaceRecognizer
+
+    rng = np.random.default_rng(0)
+    roster = make_roster(rng.normal(size=(7, 128)))
+    faces = rng.normal(size=(3, 128))
+
+    distances = FaceRecognizer({}).distance_matrix(faces, roster)
+
+    expected = np.linalg.norm(faces[:, None, :] - roster.encodings[None, :, :], axis=2)
+    assert distances.shape == (3, 7)
+    np.testing.assert_allclose(distances, expected, rtol=1e-4)
+
+
+def test_assign_matches_gives_contested_student_to_closest_face_and_falls_back():
+    from face_detector import FaceRecognizer
+
+    recognizer = FaceRecognizer({"recognition_tolerance": 0.6})
+    distances = np.array(
+        [
+            [0.30, 0.50, 0.90],  # Loses student 0 to face 1, falls back to student 1
+            [0.20, 0.70, 0.90],
+            [0.40, 0.55, 0.80],  # Both candidates taken by closer faces
+        ],
+        dtype=np.float32,
+    )
+
+    assert recognizer.assign_matches(distances).tolist() == [1, 0, -1]
+
+
+def test_assign_matches_leaves_faces_beyond_tolerance_unmatched():
+    from face_detector import FaceRecognizer
+
+    recognizer = FaceRecognizer({"recognition_tolerance": 0.6})
+    distances = np.array([[0.61, 0.9], [0.7, 0.65]], dtype=np.float32)
+
+    assert recognizer.assign_matches(distances).tolist() == [-1, -1]
+    assert recognizer.assign_matches(np.empty((0, 2), dtype=np.float32)).tolist() == []
+
+
+def test_recognize_faces_never_assigns_a_student_twice():
+    from face_detector import FaceRecognizer
+
+    roster = make_roster(np.eye(3, 128))
+    faces = np.eye(3, 128)[[0, 0, 2]] + 0.01
+
+    results = FaceRecognizer({"recognition_tolerance": 0.6}).recognize_faces(faces, roster)
+
+    assert [r["student_id"] for r in results] == [101, None, 103]
+    assert [r["recognized"] for r in results] == [True, False, True]
+
+
+def test_non_max_suppression_keeps_larger_box_over_partial_duplicates():
+    from face_detector import non_max_suppression
+
+    full = (100, 200, 200, 100)
+    cut_at_tile_edge = (100, 200, 200, 150)  # Half of the same face, inside the full box
+    neighbour = (100, 320, 200, 220)
+
+    assert non_max_suppression([cut_at_tile_edge, neighbour, full], 0.5) == [full, neighbour]
+
+
+def test_non_max_suppression_keeps_boxes_overlapping_below_threshold():
+    from face_detector import non_max_suppression
+
+    first = (0, 100, 100, 0)
+    second = (0, 160, 100, 60)  # 40% of either box overlaps
+
+    assert non_max_suppression([first, second], 0.5) == [first, second]
+    assert non_max_suppression([first, second], 0.3) == [first]
+    assert non_max_suppression([], 0.5) == []
@@ -0,0 +1,40 @@
+import uuid
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from src.utils.idempotency import idempotent
+
+
+class Item(BaseModel):
+    item_id: int
+    name: str
+
+
+def make_client(calls):
+    app = FastAPI()
+
+    @app.post("/items", response_model=List[Item], status_code=201)
+    @idempotent(status_code=201)
+    async def create_items():
+        calls.append(1)
+        return [{"item_id": 1, "name": "first", "secret": "not in the model"}]
+
+    return TestClient(app)
+
+
+def test_replay_returns_the_body_rendered_through_response_model(database):
+    calls = []
+    client = make_client(calls)
+    headers = {"Idempotency-Key": f"test-{uuid.uuid4()}"}
+
+    first = client.post("/items", headers=headers)
+    replay = client.post("/items", headers=headers)
+
+    assert first.status_code == replay.status_code == 201
+    assert first.json() == [{"item_id": 1, "name": "first"}]
+    assert replay.content == first.content
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 1
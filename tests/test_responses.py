@@ -0,0 +1,24 @@
+import pytest
+from fastapi import HTTPException
+
+from src.schemas import StudentResponse
+from src.utils.responses import model_field_names, sparse_fields, sparse_model
+
+
+def test_sparse_model_makes_every_field_optional():
+    model = sparse_model(StudentResponse)
+
+    assert model_field_names(model) == model_field_names(StudentResponse)
+    assert model(name="Ada").name == "Ada"
+    assert model().student_id is None
+    assert sparse_model(StudentResponse) is model
+
+
+def test_sparse_fields_validates_requested_names():
+    dependency = sparse_fields(StudentResponse)
+
+    assert dependency(None) == model_field_names(StudentResponse)
+    assert dependency("name, student_id,name") == ["name", "student_id"]
+    with pytest.raises(HTTPException) as error:
+        dependency("name,password")
+    assert error.value.status_code == 400
@@ -0,0 +1,32 @@
+import pytest
+
+from src.models.student import Student
+
+
+def test_row_committed_by_transaction_open_at_watermark_is_synced(database):
+    other = database.open_connection()
+    try:
+        with other.cursor() as cursor:
+            # Starts the transaction; its now() is the oldest xact_start
+            cursor.execute("SELECT student_id FROM students ORDER BY student_id LIMIT 1")
+            row = cursor.fetchone()
+        if row is None:
+            pytest.skip("no students to update")
+        student_id = row[0]
+
+        until = Student.getSyncWatermark()
+
+        with other.cursor() as cursor:
+            # updated_at is stamped with the transaction's start time
+            cursor.execute(
+                "UPDATE students SET name = name WHERE student_id = %s RETURNING updated_at",
+                [student_id],
+            )
+            stamped = cursor.fetchone()[0]
+        other.commit()
+    finally:
+        other.close()
+
+    assert stamped > until
+    changed = Student.getChangedSince(until)
+    assert student_id in [student["student_id"] for student in changed]
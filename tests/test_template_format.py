@@ -0,0 +1,66 @@
+import base64
+
+import numpy as np
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+
+from template_format import MAGIC, TemplateCodec
+
+KEY = Fernet.generate_key()
+
+
+@pytest.fixture
+def encoding():
+    return np.random.default_rng(0).normal(scale=0.1, size=128)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 1e-7), ("float16", 1e-3)])
+def test_round_trip(encoding, dtype, tolerance):
+    codec = TemplateCodec(KEY, dtype=dtype)
+
+    data = codec.encode(encoding)
+    decoded = codec.decode(data, model_tag=codec.model_tag)
+
+    assert data.startswith(MAGIC)
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, encoding, atol=tolerance)
+
+
+def test_legacy_fernet_templates_are_decoded(encoding):
+    legacy = Fernet(KEY).encrypt(base64.b64encode(encoding.astype(np.float64).tobytes()))
+
+    decoded = TemplateCodec(KEY).decode(legacy)
+
+    np.testing.assert_allclose(decoded, encoding, atol=1e-7)
+
+
+def test_templates_from_another_model_are_rejected(encoding):
+    data = TemplateCodec(KEY, model_tag="other_model").encode(encoding)
+
+    with pytest.raises(ValueError, match="other_model"):
+        TemplateCodec(KEY).decode(data, model_tag="dlib_resnet_v1")
+
+
+def test_tampered_header_or_wrong_key_fails_authentication(encoding):
+    codec = TemplateCodec(KEY)
+    data = bytearray(codec.encode(encoding))
+    data[4] = 2  # Relabel float32 as float16
+
+    with pytest.raises(InvalidTag):
+        codec.decode(bytes(data))
+    with pytest.raises(InvalidTag):
+        TemplateCodec(Fernet.generate_key()).decode(codec.encode(encoding))
+
+
+def test_bundle_round_trip():
+    codec = TemplateCodec(KEY)
+    student_ids = np.array([3, 1, 2], dtype=np.int64)
+    names = ["Zoë", "Ada", "Lin"]
+    encodings = np.random.default_rng(1).normal(size=(3, 128)).astype(np.float32)
+
+    ids, decoded_names, decoded = codec.decode_bundle(codec.encode_bundle(student_ids, names, encodings))
+
+    assert ids.tolist() == [3, 1, 2]
+    assert decoded_names == names
+    np.testing.assert_array_equal(decoded, encodings)